@@ -21,6 +21,7 @@ import os
 import subprocess
 import sys
 
+from . import git_utils
 from .messages import error, warning, debug
 
 def get_basedir():
@@ -28,46 +29,41 @@ def get_basedir():
         return sys.prefix
     return os.path.dirname(os.path.realpath(__file__))
 
-def get_basedir_git(path=None):
-    previous_directory = None
+def get_git_facts(path=None):
+    """
+    Returns a pair (location, branches), where location is the absolute
+    path of the repository containing `path`, namely its toplevel or the
+    git directory of a bare repository, and branches is the list of its
+    local branches. Everything is read by a single git process.
+    """
+    git_command = git_utils.__git__(None)
 
     if path is not None:
-        previous_directory = os.getcwd()
-        try:
-            os.chdir(path)
-        except FileNotFoundError:
+        if not os.path.isdir(path):
             error("%s: No such file or directory" % (path))
+        git_command = git_utils.__git__(path)
+    else:
+        path = os.getcwd()
 
-    # Test if the repository is bare
-    with open(os.devnull, "w") as stderr:
-        bare_command = subprocess.Popen(["git", "rev-parse", "--is-bare-repository"],
-                                        bufsize=1, stdout=subprocess.PIPE, stderr=stderr)
-
-        isbare = bare_command.stdout.readlines()
-        bare_command.wait()
-        bare_command.stdout.close()
+    # The toplevel is given last since git fails on it when the
+    # repository is bare, after having given the rest
+    rev_parse_command = subprocess.Popen(git_command + ["rev-parse", "--is-bare-repository",
+                                                        "--git-dir", "--symbolic-full-name",
+                                                        "--branches", "--show-toplevel"],
+                                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    lines = rev_parse_command.communicate()[0].decode("utf-8", "replace").splitlines()
 
-    if bare_command.returncode != 0:
-        error(_("%s: Unable to process git repository." % os.getcwd()))
+    if len(lines) < 2:
+        error(_("%s: Unable to process git repository." % path))
 
-    isbare = (isbare[0].decode("utf-8", "replace").strip() == "true")
-    absolute_path = None
+    isbare = (lines[0].strip() == "true")
 
     if isbare:
-        absolute_command = subprocess.Popen(["git", "rev-parse", "--git-dir"],
-                                            bufsize=1, stdout=subprocess.PIPE)
+        (absolute_path, branches) = (lines[1], lines[2:])
+    elif rev_parse_command.returncode == 0:
+        (absolute_path, branches) = (lines[-1], lines[2:-1])
     else:
-        absolute_command = subprocess.Popen(["git", "rev-parse", "--show-toplevel"],
-                                            bufsize=1, stdout=subprocess.PIPE)
-
-    absolute_path = absolute_command.stdout.readlines()
-    absolute_command.wait()
-    absolute_command.stdout.close()
-
-    if not absolute_path:
-        error(_("%s: Unable to determine git repository absolute path." % os.getcwd()))
-
-    if path is not None:
-        os.chdir(previous_directory)
+        error(_("%s: Unable to determine git repository absolute path." % path))
 
-    return absolute_path[0].decode("utf-8", "replace").strip()
+    # The git directory of a bare repository may be relative to it
+    return (os.path.abspath(os.path.join(path, absolute_path.strip())), branches)
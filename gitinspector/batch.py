@@ -0,0 +1,182 @@
+# coding: utf-8
+#
+# This file is part of gitinspector.
+#
+# gitinspector is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# gitinspector is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gitinspector. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Analysis of many repositories described by a manifest, for example
+to grade the repositories of a whole class at once.
+
+The manifest holds one run per line, given as on the command line:
+the repositories to be analyzed and the options of the run, which
+must include the output file of its report. Empty lines and the text
+following a '#' are ignored. For example:
+
+    --grading -F html -o reports/alice.html https://git.example.org/alice
+    --grading -F html -o reports/bob.html -x author:Teacher ~/repos/bob
+
+The runs are scheduled over a pool of processes, so that the
+interpreter is started and the modules are imported only once. The
+progress and the failures of the runs are reported as JSON objects on
+the standard output, one per line, and the summary of the runs is
+written in JSON as well.
+"""
+
+import concurrent.futures
+import contextlib
+import copy
+import io
+import json
+import shlex
+import sys
+import time
+
+from .messages import error
+from .repository import Repository
+from . import filtering, format, gitinspector, localization
+
+
+def __read_manifest__(path):
+    """Returns the list of the runs of a manifest, as pairs (line
+    number, arguments)."""
+    try:
+        with open(path, "r") as manifest:
+            lines = manifest.readlines()
+    except OSError as exception:
+        error(_("unable to read the manifest {0}: {1}").format(path, exception.strerror))
+
+    runs = []
+    for (number, line) in enumerate(lines, 1):
+        try:
+            args = shlex.split(line, comments=True)
+        except ValueError as exception:
+            error(_("{0}:{1}: {2}").format(path, number, exception))
+        if args:
+            runs.append((number, args))
+    return runs
+
+
+def __summarize__(runner):
+    """Returns the statistics of the authors of a run, as a list of
+    dictionaries."""
+    blames = runner.blames.get_summed_blames()
+    authors = []
+    for ((name, email), info) in sorted(runner.changes.get_authorinfo_list().items()):
+        authors.append({ "name": name, "email": email,
+                         "commits": info.commits,
+                         "insertions": info.insertions,
+                         "deletions": info.deletions,
+                         "rows": blames[(name, email)].rows if (name, email) in blames else 0 })
+    return authors
+
+
+def __run_entry__(number, args, defaults):
+    """Runs gitinspector with the arguments of a line of the manifest,
+    the options missing from them being taken from `defaults`. Returns
+    the result of the run as a dictionary."""
+    result = { "line": number, "repositories": [], "output": None,
+               "status": "failed", "error": None, "authors": [] }
+    start = time.time()
+    stderr = io.StringIO()
+    try:
+        # The errors are reported by messages.error, which exits
+        with contextlib.redirect_stderr(stderr):
+            options = gitinspector.__parse_arguments__(args, copy.deepcopy(defaults))
+            options.progress = False
+            result["repositories"] = options.repositories
+            result["output"] = options.output
+
+            if options.output is None:
+                raise ValueError(_("no output file is given"))
+
+            # The report is only created once the run is validated
+            runner = gitinspector.Runner(options, None)
+            with open(options.output, "w") as output:
+                runner.out = gitinspector.FileWriter(output)
+                runner.process()
+
+        result["status"] = "done"
+        result["authors"] = __summarize__(runner)
+    except (filtering.InvalidRegExpError, format.InvalidFormatError) as exception:
+        result["error"] = exception.msg
+    except SystemExit:
+        messages = [m for m in stderr.getvalue().splitlines() if "error:" in m]
+        result["error"] = messages[0] if messages else _("the run was aborted")
+    except Exception as exception:
+        result["error"] = str(exception)
+    finally:
+        # A worker process is not terminated between two runs
+        Repository.delete_all()
+        del Repository.cloned_paths[:]
+
+    result["seconds"] = round(time.time() - start, 3)
+    return result
+
+
+def __emit__(stream, event):
+    stream.write(json.dumps(event) + "\n")
+    stream.flush()
+
+
+def run(options, stream=sys.stdout):
+    """Runs the lines of the manifest given by `options.batch`, the
+    other options being the default options of the runs. Returns the
+    exit status of the program, namely 1 if a run failed, 0 otherwise.
+    """
+    runs = __read_manifest__(options.batch)
+
+    # The number of jobs bounds the number of runs taking place at the
+    # same time, each run blaming one file at a time by default
+    workers = max(1, options.jobs)
+    summary_path = options.output
+
+    defaults = copy.deepcopy(options)
+    defaults.baseline = gitinspector.__get_baseline__(options)
+    defaults.batch = None
+    defaults.output = None
+    defaults.jobs = 1
+    defaults.repositories = []
+
+    __emit__(stream, { "event": "start", "total": len(runs) })
+
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+                                                initializer=localization.init) as executor:
+        futures = [executor.submit(__run_entry__, number, args, defaults)
+                   for (number, args) in runs]
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            results.append(result)
+            event = { key: result[key] for key in ("line", "repositories", "output",
+                                                   "seconds", "error") }
+            event.update({ "event": result["status"],
+                           "completed": len(results), "total": len(runs) })
+            __emit__(stream, event)
+
+    results.sort(key=lambda r: r["line"])
+    failed = sum(1 for r in results if r["status"] != "done")
+    summary = { "manifest": options.batch, "total": len(runs),
+                "failed": failed, "runs": results }
+
+    end = { "event": "end", "total": len(runs), "failed": failed }
+    if summary_path is None:
+        end["summary"] = summary
+    else:
+        with open(summary_path, "w") as output:
+            json.dump(summary, output, indent=1)
+        end["summary"] = summary_path
+    __emit__(stream, end)
+
+    return 1 if failed else 0
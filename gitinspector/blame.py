@@ -17,22 +17,21 @@
 # You should have received a copy of the GNU General Public License
 # along with gitinspector. If not, see <http://www.gnu.org/licenses/>.
 
+import concurrent.futures
 import datetime
-import multiprocessing
-import re
 import threading
 
-from .changes import Commit, FileDiff, FileType
-from .filtering import Filters, is_filtered, is_acceptable_file_name
-from . import comment, format, git_utils, interval, terminal
+from .cache import BlameCache
+from .changes import FileDiff, FileType
+from .filtering import Filters
+from . import comment, git_utils, localization, terminal
 
-NUM_THREADS = multiprocessing.cpu_count()
 AVG_DAYS_PER_MONTH = 30.4167
 
 
 class BlameEntry(object):
     """A simple record class that stores informations about a blame. All
-    BlameEntry objects are stored into hashes (author, file) -> BlameEntry.
+    BlameEntry objects are stored into hashes (author id, file) -> BlameEntry.
     """
     rows = 0
     skew = 0     # Used when calculating average code age.
@@ -43,107 +42,85 @@ class BlameEntry(object):
             format(self.rows, self.skew, self.comments)
 
 
-__thread_lock__ = threading.BoundedSemaphore(NUM_THREADS)
 __blame_lock__ = threading.Lock()
 
 
-class BlameThread(threading.Thread):
-    """A class that launches a thread counting the blames for a given
-    file. The class is supposed to be somewhat thread-safe, and can be
-    applied a multiple number of times for the same file if needed.
+class BlameRevision(object):
+    """A simple record class that stores the informations given by git
+    about a revision appearing in the blames of a file, along with the
+    number of rows and comments it accounts for in this file.
     """
-    blamechunk_author = None
-    blamechunk_email = None
-    blamechunk_is_last = False
-    blamechunk_is_prior = False
-    blamechunk_revision = None
-    blamechunk_time = None
+    author = None
+    email = None
+    time = None
+    is_boundary = False
+    rows = 0
+    comments = 0
 
-    def __init__(self, config, changes, blames, branch, filename):
-        __thread_lock__.acquire() # Lock controlling the number of threads running
-        threading.Thread.__init__(self)
+    def __repr__(self):
+        return "BlameRevision({0} <{1}>, rows:{2}, comments:{3})".\
+            format(self.author, self.email, self.rows, self.comments)
+
+
+class BlameWorker(object):
+    """A class counting the blames for a given file, run by one of the
+    threads or processes of the pool of workers of Blame. The blames
+    are read from 'git blame --porcelain', which gives the informations
+    about a revision only once, and counted in a hash that is local to
+    the file and keyed by revision, so that the worker does not depend
+    on any global state. This hash is returned in order to be merged
+    into the global blames.
+    """
 
+    def __init__(self, config, location, sha, filename, since=""):
         self.config = config
-        self.branch = branch
-        self.useweeks = config.weeks
-        self.changes = changes
+        self.location = location
+        self.sha = sha
+        self.since = since
         self.extension = FileDiff.get_extension(filename)
-        self.blames = blames
         self.filename = filename
 
+        # Associates the revisions given by git to BlameRevisions
+        self.file_blames = {}
         self.is_inside_comment = False
 
-    def __clear_blamechunk_info__(self):
-        self.blamechunk_email = None
-        self.blamechunk_is_last = False
-        self.blamechunk_is_prior = False # Checks blame's sha to be a boundary commit
-        self.blamechunk_revision = None
-        self.blamechunk_time = None
-
-    def __handle_blamechunk_content__(self, content):
-        author = None
-        (comments, self.is_inside_comment) = \
-            comment.handle_comment_block(self.is_inside_comment,
-                                         self.extension, content)
-
-        if self.blamechunk_is_prior \
-           and self.config.since \
-           and self.blamechunk_time < self.config.since.date():
-            return
-        (author, email) = Commit.get_alias(self.blamechunk_author,
-                                           self.blamechunk_email,
-                                           self.config)
-
-        if not is_filtered(author, Filters.AUTHOR) and \
-           not is_filtered(self.blamechunk_email, Filters.EMAIL) and \
-           not is_filtered(self.blamechunk_revision, Filters.REVISION):
-
-            __blame_lock__.acquire() # Global lock used to protect calls from here...
-
-            if (author, email) not in self.changes.committers:
-                self.changes.committers[(author, email)] = { "color" : "#aaaaaa",
-                                                             "committer" : False }
-
-            if self.blames.get(((author, email), self.filename), None) is None:
-                self.blames[((author, email), self.filename)] = BlameEntry()
-
-            self.blames[((author, email), self.filename)].comments += comments
-            self.blames[((author, email), self.filename)].rows += 1
-
-            if (self.blamechunk_time - self.changes.first_commit_date).days > 0:
-                new_skew = ((self.changes.last_commit_date - self.blamechunk_time).days /
-                            (7.0 if self.useweeks else AVG_DAYS_PER_MONTH))
-                self.blames[((author, email), self.filename)].skew += new_skew
-
-            __blame_lock__.release() # ...to here.
-
     def run(self):
-        rows = git_utils.blames(self.changes.last_commit().sha,
-                                self.filename, self.config)
-        self.__clear_blamechunk_info__()
+        rows = git_utils.blames(self.location, self.sha, self.filename, self.config,
+                                self.since)
+        revision = None
 
-        #pylint: disable=W0201
         for row in rows:
-            row = row.decode("utf-8", "replace").strip()
-            keyval = row.split(" ", 2) # array of strings
-
-            if self.blamechunk_is_last:
-                self.__handle_blamechunk_content__(row)
-                self.__clear_blamechunk_info__()
-            elif keyval[0] == "boundary":
-                self.blamechunk_is_prior = True
-            elif keyval[0] == "author":
-                self.blamechunk_author = " ".join(keyval[1:])
-            elif keyval[0] == "author-mail":
-                self.blamechunk_email = keyval[1].lstrip("<").rstrip(">")
-            elif keyval[0] == "author-time":
-                self.blamechunk_time = datetime.date.fromtimestamp(int(keyval[1]))
-            elif keyval[0] == "filename":
-                self.blamechunk_is_last = True
-            elif Blame.is_revision(keyval[0]):
-                self.blamechunk_revision = keyval[0]
-
-        __thread_lock__.release() # Lock controlling the number of threads running
+            if row.startswith(b"\t"):
+                # The content of a line, that belongs to the last revision
+                (comments, self.is_inside_comment) = \
+                    comment.handle_comment_block(self.is_inside_comment, self.extension,
+                                                 row.decode("utf-8", "replace").strip())
+                revision.comments += comments
+                continue
+
+            keyval = row.rstrip(b"\n").split(b" ", 1)
+
+            if len(keyval[0]) == 40:
+                # The header of a line : "sha orig_line final_line [num_lines]",
+                # where num_lines is only given at the start of a range
+                sha = keyval[0].decode("ascii")
+                revision = self.file_blames.get(sha, None)
+                if revision is None:
+                    revision = self.file_blames[sha] = BlameRevision()
+
+                fields = keyval[1].split(b" ")
+                if len(fields) == 3:
+                    revision.rows += int(fields[2])
+            elif keyval[0] == b"boundary":
+                revision.is_boundary = True
+            elif keyval[0] == b"author":
+                revision.author = keyval[1].decode("utf-8", "replace")
+            elif keyval[0] == b"author-mail":
+                revision.email = keyval[1].decode("utf-8", "replace").lstrip("<").rstrip(">")
+            elif keyval[0] == b"author-time":
+                revision.time = datetime.date.fromtimestamp(int(keyval[1]))
+
+        return self.file_blames
 
 
 PROGRESS_TEXT = _("Checking how many rows belong to each author (2 of 2): {0:.0f}%")
@@ -157,11 +134,18 @@ class Blame(object):
     def empty(cls):
         blame = Blame.__new__(Blame)
         blame.__blames__ = {}
+        blame.identities = None
         return blame
 
-    def __init__(self, repo, changes, config):
+    def __init__(self, repo, changes, config, context):
         self.__blames__ = {}
+        self.__revisions__ = {}
         self.config = config
+        self.context = context
+        self.identities = context.identities
+
+        # The files not matching the filters are left out by git
+        pathspecs = context.filters.get_pathspecs() if config.pathspecs else []
 
         if self.config.branch == "--all":
             # Apply an heuristic to compute the blames on all the
@@ -171,51 +155,149 @@ class Blame(object):
             lines = {} # Associates files to branch
             times = {} # Associates files to time
             for b in branches:
-                # for f in git_utils.files(b, config):
+                # The dates of the last changes of all the files of a
+                # branch are read at once
+                branch_times = git_utils.last_change_times(repo.location, b, config, pathspecs) \
+                    if len(branches) > 1 else {}
                 for f in changes.files:
-                    if f in lines:
-                        if not(f in times):
-                            times[f] = git_utils.last_commit(lines[f], f)
-                        new_time = git_utils.last_commit(b, f)
-                        if new_time > times[f]:
-                            times[f] = new_time
-                            lines[f] = b
-                    else:
+                    new_time = branch_times.get(f, 0)
+                    if f not in lines or new_time > times[f]:
+                        times[f] = new_time
                         lines[f] = b
+            sizes = self.__branch_file_sizes__(repo.location, lines, pathspecs)
         else:
-            lines = {l: self.config.branch
-                     for l in git_utils.files(changes.last_commit().sha, config)}
+            sizes = git_utils.files(repo.location, changes.last_commit().sha, config, pathspecs)
+            lines = {l: self.config.branch for l in sizes}
+
+            # The rows of the files that were not modified inside the
+            # interval are older than the interval, and are not counted
+            if context.interval.has_interval() and not config.blame_all_files:
+                lines = {l: b for l, b in lines.items() if l in changes.files}
 
         if lines:
             progress_text = _(PROGRESS_TEXT)
 
-            if repo is not None:
+            if len(config.repositories) > 1:
                 progress_text = "[%s] " % repo.name + progress_text
 
-            cpt = 0
-            for filename, branch in lines.items():
-                cpt += 1
-
-                if is_acceptable_file_name(filename):
-                    thread = BlameThread(config, changes, self.__blames__,
-                                         branch, filename)
-                    thread.daemon = True
-                    thread.start()
-
-                    if config.progress and format.is_interactive_format():
-                        terminal.output_progress(progress_text, cpt, len(lines))
-
-            # Make sure all threads have completed.
-            for i in range(0, NUM_THREADS):
-                __thread_lock__.acquire()
-
-            # We also have to release them for future use.
-            for i in range(0, NUM_THREADS):
-                __thread_lock__.release()
+            # The files are blamed by a fixed pool of workers, the
+            # biggest ones first so that they do not end up running
+            # alone at the end of the run.
+            filenames = [f for f in lines if context.filters.is_acceptable_file_name(f)]
+            filenames.sort(key=lambda f: sizes.get(f, 0), reverse=True)
+
+            # The parsing of the blames can also be run by processes,
+            # which are not limited by the GIL.
+            if config.blame_backend == "processes":
+                executor = concurrent.futures.ProcessPoolExecutor(max_workers=config.jobs,
+                                                                  initializer=localization.init)
+            else:
+                executor = concurrent.futures.ThreadPoolExecutor(max_workers=config.jobs)
+
+            # The blames of the files that did not change since a
+            # previous run are read from the cache.
+            blame_cache = None
+            if config.cache_dir:
+                blame_cache = BlameCache(config.cache_dir, repo.location,
+                                         changes.last_commit().sha, config,
+                                         context.interval.get_since(), pathspecs)
+
+            with executor:
+                futures = {}
+                cpt = 0
+                for f in filenames:
+                    file_blames = blame_cache.get(f) if blame_cache else None
+                    if file_blames is None:
+                        futures[executor.submit(BlameWorker(config, repo.location,
+                                                            changes.last_commit().sha, f,
+                                                            context.interval.get_since()).run)] = f
+                    else:
+                        self.__merge_file_blames__(changes, f, file_blames)
+                        cpt += 1
+
+                for future in concurrent.futures.as_completed(futures):
+                    if blame_cache:
+                        blame_cache.put(futures[future], future.result())
+                    self.__merge_file_blames__(changes, futures[future], future.result())
+                    cpt += 1
+
+                    if config.progress and context.is_interactive_format():
+                        terminal.output_progress(progress_text, cpt, len(filenames))
+
+    def __get_revision_blame__(self, changes, sha, revision):
+        """Returns the id of the author to which the rows of a revision are
+        accounted, along with the skew of each of these rows, or None if
+        these rows are not taken into account. The result only depends on
+        the revision, and is therefore computed once for all the files."""
+        if sha in self.__revisions__:
+            return self.__revisions__[sha]
+
+        id = self.identities.resolve(revision.author, revision.email, self.config)
+        (author, email) = self.identities.get_author(id)
+
+        if revision.is_boundary and self.config.baseline:
+            # The rows coming from the baseline are not accounted
+            result = None
+        elif revision.is_boundary and self.config.since \
+           and revision.time < self.config.since.date():
+            result = None
+        elif self.context.filters.is_filtered(author, Filters.AUTHOR) or \
+             self.context.filters.is_filtered(revision.email, Filters.EMAIL) or \
+             self.context.filters.is_filtered(sha, Filters.REVISION):
+            result = None
+        else:
+            skew = 0
+            if (revision.time - changes.first_commit_date).days > 0:
+                skew = ((changes.last_commit_date - revision.time).days /
+                        (7.0 if self.config.weeks else AVG_DAYS_PER_MONTH))
+            result = (id, skew)
+
+        self.__revisions__[sha] = result
+        return result
+
+    def __merge_file_blames__(self, changes, filename, file_blames):
+        """Resolve the aliases and the filters of the blames of a file,
+        as returned by a BlameWorker, and add them to the blames."""
+        with __blame_lock__:
+            for sha, revision in file_blames.items():
+                result = self.__get_revision_blame__(changes, sha, revision)
+                if result is None:
+                    continue
+                (id, skew) = result
+
+                author = self.identities.get_author(id)
+                if author not in changes.committers:
+                    changes.committers[author] = { "color" : "#aaaaaa",
+                                                   "committer" : False }
+
+                entry = self.__blames__.get((id, filename), None)
+                if entry is None:
+                    entry = self.__blames__[(id, filename)] = BlameEntry()
+
+                entry.comments += revision.comments
+                entry.rows += revision.rows
+                entry.skew += skew * revision.rows
+
+    def __branch_file_sizes__(self, location, lines, pathspecs=None):
+        """Returns a hash associating the files to blame to their sizes,
+        given a hash associating these files to branches of the
+        repository located at `location`."""
+        sizes = {}
+        for branch in set(lines.values()):
+            branch_sizes = git_utils.files(location, branch, self.config, pathspecs)
+            sizes.update({f: branch_sizes[f] for f in lines
+                          if lines[f] == branch and f in branch_sizes})
+        return sizes
 
     def __iadd__(self, other):
         """Concatenate lists of blames"""
         try:
+            # The ids of the authors of another process are translated
+            if self.identities is None:
+                self.identities = other.identities
+            elif other.identities is not self.identities:
+                ids = self.identities.merge(other.identities)
+                other.__blames__ = {(ids[id], f): b for ((id, f), b) in other.__blames__.items()}
             self.__blames__.update(other.__blames__)
             return self
         except AttributeError:
@@ -223,38 +305,31 @@ class Blame(object):
 
     def __repr__(self):
         num_rows  = sum([e.rows for b,e in self.__blames__.items()])
-        blame_str = "\n".join(["Blame(\033[93m{0}\033[0m : {1} {2})".format(f, (a,e), b)
-                               for ((a,e),f),b in self.__blames__.items()])
+        blame_str = "\n".join(["Blame(\033[93m{0}\033[0m : {1} {2})".format(f, a, b)
+                               for (a,f),b in self.all_blames().items()])
         return "Blames({0}, rows:\033[92m{1}\033[0m)\n{2}".\
             format(len(self.__blames__), num_rows, blame_str)
 
-    @staticmethod
-    def is_revision(string):
-        """Tests if a string is a git revision"""
-        revision = re.search("([0-9a-f]{40})", string)
-
-        if revision is None:
-            return False
-
-        return revision.group(1).strip()
-
     @staticmethod
     def get_stability(author, blamed_rows, changes):
-        if author in changes.get_authorinfo_list():
-            author_insertions = changes.get_authorinfo_list()[author].insertions
+        authorinfo = changes.get_authorinfo_list().get(author, None)
+        if authorinfo is not None:
+            author_insertions = authorinfo.insertions
             return 100 if author_insertions == 0 else 100.0 * blamed_rows / author_insertions
         return 100
 
     def all_blames(self):
-        """Returns a list of all the BlameEntry objects"""
-        return self.__blames__
+        """Returns a hash associating the pairs ((author,email),file) to
+        BlameEntry objects"""
+        return {(self.identities.get_author(id), f): b
+                for ((id, f), b) in self.__blames__.items()}
 
     def blames_for_file(self, file):
         """Returns a list of pairs ((author,email),num) that counts the blames
         for a given file
 
         Ex. : [(('Frodo Baggins', 'frodo.baggins@shire.net'), 8)]"""
-        return [(c[0], self.__blames__[c].rows)
+        return [(self.identities.get_author(c[0]), self.__blames__[c].rows)
                 for c in self.__blames__ if c[1] == file]
 
     def get_summed_blames(self):
@@ -271,7 +346,7 @@ class Blame(object):
             summed_blames[committer].skew += blame.skew
             summed_blames[committer].comments += blame.comments
 
-        return summed_blames
+        return {self.identities.get_author(id): b for (id, b) in summed_blames.items()}
 
     def get_typed_blames(self):
         """Returns a hash where keys are (author,email) and values are
@@ -288,16 +363,16 @@ class Blame(object):
             else:
                 typed_blames[committer][type] = blame.rows
 
-        return typed_blames
+        return {self.identities.get_author(id): t for (id, t) in typed_blames.items()}
 
     def committers_by_responsibilities(self):
         """Sorts the (author,email) in __blames__ by decreasing order of
         responsibility."""
-        wrk = [(k[0], v.rows) for (k, v) in self.__blames__.items()]
-        aut = set([k[0] for k in wrk])
-        res = sorted(aut,
-                     key=lambda a: -sum([w for (b, w) in wrk if b == a]))
-        return res
+        wrk = {}
+        for (k, v) in self.__blames__.items():
+            wrk[k[0]] = wrk.get(k[0], 0) + v.rows
+        res = sorted(wrk, key=lambda a: -wrk[a])
+        return [self.identities.get_author(a) for a in res]
 
     def get_responsibilities(self, committer):
         """Returns the list of blames of a given (author,email) where each
@@ -305,9 +380,10 @@ class Blame(object):
 
         Ex. : [('Makefile',20), ('include/trie.h',5), ('src/Makefile',22)]"""
         author_blames = {}
+        id = self.identities.get_id(committer) if self.identities else None
 
         for i in self.__blames__.items():
-            if committer == i[0][0]:
+            if id == i[0][0]:
                 total_rows = i[1].rows - i[1].comments
                 if total_rows > 0:
                     author_blames[i[0][1]] = total_rows
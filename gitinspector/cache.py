@@ -0,0 +1,199 @@
+# coding: utf-8
+#
+# This file is part of gitinspector.
+#
+# gitinspector is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# gitinspector is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gitinspector. If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import os
+import pickle
+import stat
+import tempfile
+
+from . import git_utils
+from .messages import error
+
+# To be increased whenever the format of the cached data changes
+CACHE_VERSION = 3
+
+# The number of commits stored in each file of a CommitCache
+BATCH_SIZE = 1000
+
+
+def __cache_path__(cache_dir, kind, key):
+    """Returns the path of the file storing the data of a given kind
+    associated to a key, which must have a stable representation."""
+    digest = hashlib.sha1(repr((CACHE_VERSION, key)).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, "{0}-{1}".format(kind, digest))
+
+
+def is_safe_dir(cache_dir):
+    """Returns whether the data of a cache directory can be trusted. The
+    cache files are unpickled, which may run arbitrary code, so the
+    directory must belong to the current user and must not be writable
+    by the group or by the others. A missing directory is created safe."""
+    try:
+        status = os.stat(cache_dir)
+    except FileNotFoundError:
+        return True
+    except OSError:
+        return False
+
+    if not stat.S_ISDIR(status.st_mode):
+        return False
+    if hasattr(os, "getuid") and status.st_uid != os.getuid():
+        return False
+    return not status.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def __load__(path):
+    """Returns the data stored in a cache file, or None if the file is
+    missing or unreadable."""
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def __store__(path, data):
+    """Stores data in a cache file. The file is written aside and then
+    renamed, so that concurrent runs never read a partial file."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as f:
+        pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(f.name, path)
+
+
+class CommitCache(object):
+    """A persistent cache of the commit chunks read from git by
+    git_utils.commit_chunks, keyed by the repository, the revisions, the
+    interval, the pathspecs and the options changing the output of git.
+    The dates of the interval are part of the key once resolved, so that
+    a relative date such as 2.weeks does not designate a stale interval.
+
+    The cache remembers the tips of the revisions it was built from,
+    so that only the commits that are not reachable from these tips are
+    read from git on the next run. If one of them is not an ancestor of
+    the current tips anymore, the history has been rewritten and the
+    cache is built again from scratch.
+
+    The commits are stored by batches of BATCH_SIZE, one file per batch,
+    listed by an index file along with the tips. A single batch is held
+    in memory at a time, both when reading and when writing the cache.
+    The batch files are named after their contents, so that concurrent
+    runs never write different data in the same file.
+    """
+    def __init__(self, cache_dir, repo, hashes, since, until, config, messages=False,
+                 pathspecs=None):
+        self.repo = repo
+        self.hashes = hashes
+        self.since = since
+        self.until = until
+        self.config = config
+        self.messages = messages
+        self.pathspecs = pathspecs
+        key = (git_utils.git_dir(repo), hashes, git_utils.absolute_dates(repo, since, until),
+               bool(config.ignore_space), bool(config.hard), config.baseline, messages,
+               tuple(pathspecs or []))
+        self.path = __cache_path__(cache_dir, "commits", key)
+
+    def chunks(self):
+        """Generates the commit chunks, the cached ones first and then
+        the new ones read from git, and updates the cache."""
+        tips = git_utils.tips(self.repo, self.hashes)
+        if not tips:
+            yield from git_utils.commit_chunks(self.repo, self.hashes, self.since,
+                                               self.until, self.config, self.messages,
+                                               self.pathspecs)
+            return
+
+        index = __load__(self.path)
+        if index is None or not git_utils.are_ancestors(self.repo, index["tips"], tips) or \
+           not all(os.path.isfile(self.__batch_path__(name)) for name in index["batches"]):
+            index = { "tips": [], "batches": [] }
+
+        for name in index["batches"]:
+            batch = __load__(self.__batch_path__(name))
+            if batch is None:
+                error(_("{0}: unable to read the cached commits, the file must be "
+                        "removed").format(self.__batch_path__(name)))
+            yield from batch
+        if set(index["tips"]) == set(tips):
+            return
+
+        hashes = " ".join(tips + (["--not"] + index["tips"] if index["tips"] else []))
+        batches = list(index["batches"])
+        batch = []
+        for chunk in git_utils.commit_chunks(self.repo, hashes, self.since,
+                                             self.until, self.config, self.messages,
+                                             self.pathspecs):
+            # The chunks are consumed by Commit.handle_diff_chunk, only
+            # copies of them are stored
+            batch.append(list(chunk))
+            yield chunk
+            if len(batch) == BATCH_SIZE:
+                batches.append(self.__store_batch__(batch))
+                batch = []
+        if batch:
+            batches.append(self.__store_batch__(batch))
+
+        __store__(self.path, { "tips": tips, "batches": batches })
+
+    def __batch_path__(self, name):
+        return os.path.join(os.path.dirname(self.path), name)
+
+    def __store_batch__(self, batch):
+        """Stores a batch of commit chunks, returning the name of its
+        file."""
+        digest = hashlib.sha1(b"".join(chunk[0] for chunk in batch)).hexdigest()
+        name = "{0}-{1}".format(os.path.basename(self.path), digest)
+        __store__(self.__batch_path__(name), batch)
+        return name
+
+
+class BlameCache(object):
+    """A persistent cache of the blames of the files of a commit, as
+    counted by BlameWorker. The blames of a file only depend on its
+    contents, on the history leading to the last commit changing it and
+    on the options given to git blame, which form the key of the cache:
+    the blames of the files that did not change since the last run are
+    not computed again, and the runs over forks sharing a history share
+    the blames of the files they did not change. If `pathspecs` is
+    given, only the files matching them can be cached.
+    """
+    def __init__(self, cache_dir, repo, sha, config, since="", pathspecs=None):
+        self.cache_dir = cache_dir
+        self.options = (bool(config.ignore_space), bool(config.hard), config.baseline,
+                        git_utils.absolute_dates(repo, since))
+        self.objects = git_utils.tree_entries(repo, sha, config, pathspecs)
+        self.last_changes = git_utils.last_changes(repo, sha, config, pathspecs)
+
+    def __path__(self, filename):
+        if filename not in self.objects or filename not in self.last_changes:
+            return None
+        key = (self.objects[filename][0], self.last_changes[filename], filename, self.options)
+        return __cache_path__(self.cache_dir, "blames", key)
+
+    def get(self, filename):
+        """Returns the blames of a file, or None if they are not cached."""
+        path = self.__path__(filename)
+        return None if path is None else __load__(path)
+
+    def put(self, filename, file_blames):
+        """Stores the blames of a file."""
+        path = self.__path__(filename)
+        if path is not None:
+            __store__(path, file_blames)
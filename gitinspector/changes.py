@@ -17,15 +17,20 @@
 # You should have received a copy of the GNU General Public License
 # along with gitinspector. If not, see <http://www.gnu.org/licenses/>.
 
-import bisect
-import copy
+import collections
 import datetime
+import gc
+import heapq
 import os
-import re
-from .filtering import Filters, is_filtered, is_acceptable_file_name
-from . import format, git_utils, interval
+from types import MappingProxyType
+from .cache import CommitCache
+from .columns import CommitTable, combine, group_sums, take
+from .filtering import Filters
+from . import git_utils, localization
 from enum import Enum, auto
 
+localization.init()
+
 
 class CommitType(Enum):
     """
@@ -100,8 +105,15 @@ class FileType(Enum):
         "xml"      : TXT,
     }
 
+    # File name -> FileType, as the same files are met in most commits
+    __created__ = {}
+
     @staticmethod
     def create(file):
+        type = FileType.__created__.get(file, None)
+        if type is not None:
+            return type
+
         _, rfile = os.path.split(file)
         _, ext = os.path.splitext(rfile)
         if ext:
@@ -110,9 +122,11 @@ class FileType(Enum):
             key = rfile
         type = FileType.__types__.get(key)
         if (type is None):
-            return FileType.OTHER
+            type = FileType.OTHER
         else:
-            return FileType(type)
+            type = FileType(type)
+        FileType.__created__[file] = type
+        return type
 
 class AuthorColors(object):
     """
@@ -126,66 +140,103 @@ class AuthorColors(object):
         "#b41f77", "#0eff7f", "#2c2ca0", "#28d627", "#bd9467",
         "#4b8c56", "#c2e377", "#22bcbd", "#cf17be",
     ]
-    index = -1
 
-    @staticmethod
-    def get_new_color():
-        AuthorColors.index += 1
-        return AuthorColors.colors[AuthorColors.index % len(AuthorColors.colors)]
+    def __init__(self):
+        self.index = -1
+
+    def get_new_color(self):
+        self.index += 1
+        return AuthorColors.colors[self.index % len(AuthorColors.colors)]
+
+
+class Identities(object):
+    """
+    A table associating the authors of a run to dense integer ids. The
+    (author, email) pairs given by git are resolved once, when they are
+    first met, applying the aliases and the merge of the authors. The
+    statistics are keyed by these ids, which are turned back into
+    (author, email) pairs when the statistics are output.
+    """
+    def __init__(self):
+        self.authors = []       # Id -> resolved (author, email)
+        self.__ids__ = {}       # Resolved (author, email) -> id
+        self.__raw_ids__ = {}   # (author, email) given by git -> id
+
+    def resolve(self, author, email, config):
+        """Returns the id of an (author, email) pair given by git."""
+        id = self.__raw_ids__.get((author, email), None)
+        if id is None:
+            id = self.__add_author__(Commit.get_alias(author, email, config))
+            self.__raw_ids__[(author, email)] = id
+        return id
+
+    def __add_author__(self, author):
+        id = self.__ids__.get(author, None)
+        if id is None:
+            id = self.__ids__[author] = len(self.authors)
+            self.authors.append(author)
+        return id
+
+    def get_id(self, author):
+        """Returns the id of a resolved (author, email) pair, or None."""
+        return self.__ids__.get(author, None)
+
+    def get_author(self, id):
+        return self.authors[id]
+
+    def merge(self, other):
+        """
+        Adds the authors of another table, for example one filled by
+        another process, and returns the list associating their ids in
+        `other` to their ids in this table.
+        """
+        return [self.__add_author__(author) for author in other.authors]
 
 
 class FileDiff(object):
-    def __init__(self, name, line):
-        commit_line = line.split("|")
-
-        if commit_line.__len__() == 2:
-            self.name = name
-            if is_acceptable_file_name(self.name):
-                self.type = FileType.create(self.name)
-            else:
-                self.type = FileType.OTHER
-            self.insertions = commit_line[1].count("+")
-            self.deletions = commit_line[1].count("-")
+    # There is one FileDiff per file modified by a commit, the slots
+    # spare the dictionary of each of them
+    __slots__ = ("name", "type", "binary", "insertions", "deletions")
+
+    def __init__(self, name, insertions, deletions, filters):
+        self.name = name
+        if filters.is_acceptable_file_name(self.name):
+            self.type = FileType.create(self.name)
+        else:
+            self.type = FileType.OTHER
+        # Binary files have no insertions or deletions
+        self.binary = insertions is None
+        self.insertions = 0 if self.binary else insertions
+        self.deletions = 0 if self.binary else deletions
 
     def __repr__(self):
         return "FileDiff(name: \033[93m{0}\033[0m, ins: \033[92m{1}\033[0m, del: \033[91m{2}\033[0m)".\
             format(self.name, self.insertions, self.deletions)
 
     @staticmethod
-    def is_filediff_line(string):
-        pattern = re.compile("^[^\|]+\|[ ]*(Bin[ ].*|[0-9]+[ ]*[+-]*)$")
-        return pattern.match(string) is not None
-
-    @staticmethod
-    def get_extension(string):
-        string = string.split("|")[0].strip().strip("{}").strip("\"").strip("'")
-        return os.path.splitext(string)[1][1:]
-
-    @staticmethod
-    def get_filename(string):
-        file_name = string.split("|")[0].strip()
-        file_name = re.sub(r"^(.*)\{([^\}]*) => ([^\}]*)\}(.*)$", r"\1\3\4", file_name)
-        file_name = re.sub(r"^(.*) => (.*)$", r"\2", file_name)
-        file_name = file_name.strip("{}").strip("\"").strip("'")
-        return file_name
+    def get_extension(file_name):
+        return os.path.splitext(file_name)[1][1:]
 
 
 class Commit(object):
-    def __init__(self, string, config):
+    __slots__ = ("filediffs", "timestamp", "date", "sha", "author_id",
+                 "author", "email", "type")
+
+    def __init__(self, string, config, identities):
         self.filediffs = []
-        self.config = config
         commit_line = string.split("|")
 
         if commit_line.__len__() == 5:
-            self.timestamp = commit_line[0]
+            self.timestamp = int(commit_line[0])
             self.date = commit_line[1]
             self.sha = commit_line[2]
             author = commit_line[3].strip()
             email = commit_line[4].strip()
-            (self.author, self.email) = Commit.get_alias(author, email, self.config)
+            self.author_id = identities.resolve(author, email, config)
+            (self.author, self.email) = identities.get_author(self.author_id)
 
     def __lt__(self, other): # only used for sorting; we just consider the timestamp.
-        return self.timestamp.__lt__(other.timestamp)
+        return self.timestamp < other.timestamp
 
     def __repr__(self):
         if (self.type == CommitType.MERGE):
@@ -202,41 +253,42 @@ class Commit(object):
         return self.filediffs
 
     @staticmethod
-    def handle_diff_chunk(config, changes, commits, chunk):
-        commit_line = chunk.pop(0).strip().\
-            decode("unicode_escape", "ignore").\
-            encode("latin-1", "replace").\
-            decode("utf-8", "replace")
-        (author, email) = Commit.get_author_and_email(config, changes, commit_line)
-        if (author, email) not in changes.committers:
-            changes.committers[(author, email)] = {
-                "color": AuthorColors.get_new_color() }
-        found_valid_extension = False
-        commit = Commit(commit_line, config)
-        has_been_filtered = (is_filtered(commit.author, Filters.AUTHOR) or \
-                             is_filtered(commit.email,  Filters.EMAIL) or \
-                             is_filtered(commit.sha,    Filters.REVISION) or \
-                             is_filtered(commit.sha,    Filters.MESSAGE))
+    def handle_diff_chunk(config, context, changes, commits, chunk):
+        (commit_line, _sep, message) = chunk.pop(0).partition(b"\x1e")
+        commit_line = commit_line.strip().decode("utf-8", "replace")
+        commit = Commit(commit_line, config, context.identities)
+        table = changes.table
+        row = table.add_commit(commit.author_id, commit.date)
+        if (commit.author, commit.email) not in changes.committers:
+            changes.committers[(commit.author, commit.email)] = {
+                "color": context.colors.get_new_color() }
+        filters = context.filters
+        has_been_filtered = (filters.is_filtered(commit.author, Filters.AUTHOR) or \
+                             filters.is_filtered(commit.email,  Filters.EMAIL) or \
+                             filters.is_filtered(commit.sha,    Filters.REVISION) or \
+                             filters.is_filtered_message(commit.sha, message))
 
         if has_been_filtered:
             commit.type = CommitType.FILTERED
         elif not chunk: # Chunk is [], it is a pure merge
             commit.type = CommitType.MERGE
         else:
-            commit.type = CommitType.FILTERED # if all files are filtered
-            for line in chunk:
-                line = line.strip().\
-                    decode("unicode_escape", "ignore").\
-                    encode("latin-1", "replace").\
-                    decode("utf-8", "replace")
-                if FileDiff.is_filediff_line(line):
-                    file_name = FileDiff.get_filename(line)
+            commit.type = CommitType.CODE
+            other = FileType.OTHER
+            for (insertions, deletions, path) in chunk:
+                # The name of a file is decoded once, and then shared
+                # by all the FileDiffs of the file
+                file_name = changes.paths.get(path, None)
+                if file_name is None:
+                    file_name = changes.paths[path] = path.decode("utf-8", "replace")
                     changes.files.add(file_name)
-                    filediff = FileDiff(file_name, line)
-                    commit.add_filediff(filediff)
-                    commit.type = CommitType.CODE
+                filediff = FileDiff(file_name, insertions, deletions, filters)
+                commit.add_filediff(filediff)
+                table.add_diff(row, filediff.type.value, filediff.insertions, filediff.deletions)
+                if filediff.type is other:
+                    table.add_other(row, file_name)
 
-        bisect.insort(commits, commit)
+        commits.append(commit)
 
     @staticmethod
     def get_alias(author, email, config):
@@ -248,17 +300,6 @@ class Commit(object):
                 config.aliases[email] = "{0} <{1}>".format(author, email)
             return (author, email)
 
-    @staticmethod
-    def get_author_and_email(config, changes, string):
-        commit_line = string.split("|")
-        try:
-            author = commit_line[3].strip()
-            email = commit_line[4].strip()
-            (real_author, real_email) = Commit.get_alias(author, email, config)
-            return (real_author, real_email)
-        except IndexError:
-            return "Unknown Author"
-
 
 class AuthorInfo(object):
     def __init__(self):
@@ -272,6 +313,12 @@ class AuthorInfo(object):
         return "Info(ins: \033[92m{0}\033[0m, del: \033[91m{1}\033[0m, commits: {2})".\
             format(self.insertions, self.deletions, self.commits)
 
+    def add_rows(self, type, insertions, deletions):
+        """Adds the rows inserted and deleted in files of a given type."""
+        self.insertions += insertions
+        self.deletions += deletions
+        self.types[type] = self.types.get(type, 0) + insertions + deletions
+
 
 PROGRESS_TEXT = _("Fetching and calculating primary statistics (1 of 2): {0:.0f}%")
 
@@ -284,43 +331,70 @@ class Changes(object):
         changes.__commits__ = []
         changes.authors = {}
         changes.authors_dateinfo = {}
+        changes.authors_work = {}
         changes.committers = {}
         changes.files = set()
+        changes.paths = {}
+        changes.table = CommitTable()
+        changes.identities = None
         return changes
 
-    def __init__(self, repo, config):
+    def __init__(self, repo, config, context):
         self.__commits__ = []
         self.authors = {}
         self.authors_dateinfo = {}
+        self.authors_work = {}
         self.committers = {}
         self.files = set()
+        self.paths = {} # Names of the files, as given by git -> decoded
+        self.table = CommitTable()
         self.config = config
+        self.identities = context.identities
 
-        interval.set_ref("HEAD")
+        context.interval.set_ref("HEAD")
 
         progress_text = _(PROGRESS_TEXT)
-        if repo is not None:
+        if len(self.config.repositories) > 1:
             progress_text = "[%s] " % repo.name + progress_text
 
-        chunks =  git_utils.commit_chunks(self.config.branch, \
-                                          interval.get_since(), interval.get_until(), \
-                                          self.config)
+        # The chunks are generated while git is running, and each one
+        # is handled before the next one is read.
+        # The messages are only read when they are filtered
+        messages = context.filters.has_filters(Filters.MESSAGE)
+        # The files not matching the filters are left out by git
+        pathspecs = context.filters.get_pathspecs() if self.config.pathspecs else []
+        if self.config.cache_dir:
+            chunks = CommitCache(self.config.cache_dir, repo.location, self.config.branch,
+                                 context.interval.get_since(), context.interval.get_until(),
+                                 self.config, messages, pathspecs).chunks()
+        else:
+            chunks = git_utils.commit_chunks(repo.location, self.config.branch, \
+                                             context.interval.get_since(), \
+                                             context.interval.get_until(), \
+                                             self.config, messages, pathspecs)
 
         commits = []
         for chunk in chunks:
-            Commit.handle_diff_chunk(self.config, self, commits, chunk)
+            Commit.handle_diff_chunk(self.config, context, self, commits, chunk)
+        # git already outputs the commits in chronological order, up to
+        # the clock skews, and sorting a list with few inversions is
+        # close to linear. The sort is stable, keeping git's order.
+        commits.sort()
         self.__commits__ = commits
 
         if self.__commits__:
-            if interval.has_interval(): # or self.config.branch != "master":
-                interval.set_ref(self.__commits__[-1].sha)
+            if context.interval.has_interval(): # or self.config.branch != "master":
+                context.interval.set_ref(self.__commits__[-1].sha)
+
+            self.__update_dates__()
 
-            self.first_commit_date = datetime.date(int(self.__commits__[0].date[0:4]),
-                                                   int(self.__commits__[0].date[5:7]),
-                                                   int(self.__commits__[0].date[8:10]))
-            self.last_commit_date = datetime.date(int(self.__commits__[-1].date[0:4]),
-                                                  int(self.__commits__[-1].date[5:7]),
-                                                  int(self.__commits__[-1].date[8:10]))
+    def __update_dates__(self):
+        self.first_commit_date = datetime.date(int(self.__commits__[0].date[0:4]),
+                                               int(self.__commits__[0].date[5:7]),
+                                               int(self.__commits__[0].date[8:10]))
+        self.last_commit_date = datetime.date(int(self.__commits__[-1].date[0:4]),
+                                              int(self.__commits__[-1].date[5:7]),
+                                              int(self.__commits__[-1].date[8:10]))
 
     def __repr__(self):
         comm_str = "\n".join([ str(s) for s in self.__commits__ ])
@@ -329,42 +403,110 @@ class Changes(object):
 
     def __iadd__(self, other):
         try:
-            self.authors.update(other.authors)
-            self.authors_dateinfo.update(other.authors_dateinfo)
             self.committers.update(other.committers)
 
-            for commit in other.__commits__:
-                bisect.insort(self.__commits__, commit)
-            if not self.__commits__ and not other.__commits__:
-                self.__commits__ = []
+            # The ids of the authors of another process are translated
+            ids = None
+            if self.identities is None:
+                self.identities = other.identities
+            elif other.identities is not self.identities:
+                ids = self.identities.merge(other.identities)
+                for commit in other.__commits__:
+                    commit.author_id = ids[commit.author_id]
+            self.table.extend(other.table, ids)
 
-            self.changes.files.update(other.files)
+            # Both lists of commits are sorted, merge them in linear time
+            self.__commits__ = list(heapq.merge(self.__commits__, other.__commits__))
+            if self.__commits__:
+                self.__update_dates__()
+
+            # The cached informations have to be computed again
+            self.authors = {}
+            self.authors_dateinfo = {}
+            self.authors_work = {}
+
+            self.files.update(other.files)
 
             return self
         except AttributeError:
             return other
 
-    def __update_dict_commit__(self, dict, key, commit):
+    def __aggregate__(self):
         """
-        Given `dict` whose values are AuthorInfos, add to dict[key] the
-        properties of `commit` (insertions, deletions).
+        Computes the AuthorInfos of the authors, and of the authors per
+        date, along with the amount of work of the authors. The columns
+        of the CommitTable filled while reading the commits are summed
+        by author and date, and by type of file, and each group is then
+        added once to the AuthorInfos. The AuthorInfos keyed by
+        (author, email), as read by the outputs, are computed here once
+        and then shared by all of them.
         """
-        if key not in dict:
-            dict[key] = AuthorInfo()
+        # The AuthorInfos hold no cycles, and collecting the garbage
+        # while they are created would scan all the commits again
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self.__aggregate_columns__()
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def __aggregate_columns__(self):
+        table = self.table
+        num_authors = max(table.commit_authors, default=-1) + 1
+        file_types = {t.value: t for t in FileType}
+        num_types = max(file_types) + 1
+        other = FileType.OTHER
+        other_value = other.value
+
+        # The authors appear in the order of their first commits, the
+        # AuthorInfos per date are keyed by date * num_authors + author
+        self.authors = {id: AuthorInfo() for id in dict.fromkeys(c.author_id for c in self.__commits__)}
+        self.authors_dateinfo = {}
+        self.authors_work = dict.fromkeys(self.authors, 0)
 
         # Even commits with no diffs (for example merges) are counted
-        dict[key].commits += 1
-
-        for j in commit.get_filediffs():
-            if (j.type == FileType.OTHER):
-                dict[key].types[j.type].add(j.name)
-            else:
-                dict[key].insertions += j.insertions
-                dict[key].deletions += j.deletions
-                if (j.type in dict[key].types):
-                    dict[key].types[j.type] += j.insertions + j.deletions
-                else:
-                    dict[key].types[j.type] = j.insertions + j.deletions
+        date_authors = combine(table.commit_dates, table.commit_authors, num_authors)
+        for (date_author, (commits,)) in group_sums(date_authors).items():
+            self.authors[date_author % num_authors].commits += commits
+            info = self.authors_dateinfo[date_author] = AuthorInfo()
+            info.commits = commits
+
+        # The rows of the other files only count in the amount of work
+        author_rows = {}
+        date_author_types = combine(take(date_authors, table.diff_commits), table.diff_types, num_types)
+        for (key, (_, insertions, deletions)) in \
+            group_sums(date_author_types, table.insertions, table.deletions).items():
+            (date_author, type) = divmod(key, num_types)
+            author = date_author % num_authors
+            self.authors_work[author] += insertions + deletions
+            if type != other_value:
+                info = self.authors_dateinfo[date_author]
+                info.insertions += insertions
+                info.deletions += deletions
+                info.types[file_types[type]] = insertions + deletions
+
+                (author_insertions, author_deletions) = author_rows.get(author * num_types + type, (0, 0))
+                author_rows[author * num_types + type] = (author_insertions + insertions,
+                                                          author_deletions + deletions)
+
+        for (key, (insertions, deletions)) in author_rows.items():
+            (author, type) = divmod(key, num_types)
+            self.authors[author].add_rows(file_types[type], insertions, deletions)
+
+        other_names = collections.defaultdict(set)
+        for (date_author, name) in zip(take(date_authors, table.other_commits).tolist(), table.other_names):
+            other_names[date_author].add(name)
+        for (date_author, names) in other_names.items():
+            self.authors_dateinfo[date_author].types[other].update(names)
+            self.authors[date_author % num_authors].types[other].update(names)
+
+        authors = self.identities.authors if self.identities else []
+        self.authorinfo_list = MappingProxyType(
+            {authors[id]: info for (id, info) in self.authors.items()})
+        self.authordateinfo_list = MappingProxyType(
+            {(table.dates[date_author // num_authors], authors[date_author % num_authors]): info
+             for (date_author, info) in self.authors_dateinfo.items()})
 
     def all_commits(self):
         return self.__commits__
@@ -393,14 +535,14 @@ class Changes(object):
 
     def get_authorinfo_list(self):
         """
-        Returns a hash associating authors to AuthorInfo objects,
-        technically a number of insertions, deletions and commits.
+        Returns a read-only hash associating authors to AuthorInfo
+        objects, technically a number of insertions, deletions and
+        commits. The AuthorInfos are shared and must not be modified.
         """
         if not self.authors:
-            for i in self.__commits__:
-                self.__update_dict_commit__(self.authors, (i.author, i.email), i)
+            self.__aggregate__()
 
-        return copy.deepcopy(self.authors)
+        return self.authorinfo_list
 
     def get_total_types(self):
         author_list = self.get_authorinfo_list()
@@ -411,31 +553,31 @@ class Changes(object):
 
     def get_authordateinfo_list(self):
         """
-        Returns a hash associating (authors * dates) to AuthorInfo objects.
-        Basically splits the return of get_authorinfo_list() on the dates.
+        Returns a read-only hash associating (authors * dates) to
+        AuthorInfo objects. Basically splits the return of
+        get_authorinfo_list() on the dates.
         """
         if not self.authors_dateinfo:
-            for i in self.__commits__:
-                self.__update_dict_commit__(self.authors_dateinfo, (i.date, (i.author, i.email)), i)
+            self.__aggregate__()
 
-        return copy.deepcopy(self.authors_dateinfo)
+        return self.authordateinfo_list
 
     def authors_by_responsibilities(self):
         """
         Returns a list of authors sorted according to their amount of
         work, namely the sum of their insertions and deletions.
         """
-        wrk = [((c.author, c.email), sum([f.insertions + f.deletions for f in c.filediffs]))
-               for c in self.__commits__]
-        aut = set([k[0] for k in wrk])
-        res = sorted(aut,
-                     key=lambda a: -sum([w for (b,w) in wrk if b == a]))
-        return res
+        if not self.authors_work:
+            self.__aggregate__()
+        wrk = self.authors_work
+        res = sorted(wrk, key=lambda a: -wrk[a])
+        return [self.identities.get_author(a) for a in res]
 
     def filtered_files(self, author):
         """
-        Returns a list of files that have been filtered during the run,
-        given an (author,email) key.
+        Returns the set of files that have been filtered during the run,
+        given an (author,email) key. The set is shared and must not be
+        modified.
         """
         authorinfo_dict = self.get_authorinfo_list()
         if (author in authorinfo_dict):
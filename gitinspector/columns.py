@@ -0,0 +1,156 @@
+# coding: utf-8
+#
+# This file is part of gitinspector.
+#
+# gitinspector is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# gitinspector is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gitinspector. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Columnar storage of the commits and of their diffs, from which the
+statistics of the authors are computed by grouped sums. The columns
+are arrays of integers, filled while the commits are read, and summed
+by NumPy when it is available, and by a single loop otherwise.
+"""
+
+import array
+import collections
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def __column__():
+    return array.array("q")
+
+
+def __numpy__(column):
+    if isinstance(column, array.array):
+        return numpy.frombuffer(column, dtype=numpy.int64) if column else \
+            numpy.zeros(0, dtype=numpy.int64)
+    return column
+
+
+class CommitTable(object):
+    """
+    The commits of a repository and their diffs, as columns of integers.
+    The commits have one row each, holding the id of their author and
+    the index of their date in `dates`. The diffs have one row each,
+    holding the row of their commit, the value of the FileType of the
+    file and the numbers of insertions and deletions. The names of the
+    files are only kept for the diffs of the other files
+    (FileType.OTHER), as they are listed in the statistics.
+    """
+    def __init__(self):
+        self.dates = []             # Index -> date
+        self.date_indexes = {}      # Date -> index
+
+        self.commit_authors = __column__()
+        self.commit_dates = __column__()
+        self.diff_commits = __column__()
+        self.diff_types = __column__()
+        self.insertions = __column__()
+        self.deletions = __column__()
+        self.other_commits = __column__()
+        self.other_names = []
+
+    def __date_index__(self, date):
+        index = self.date_indexes.get(date, None)
+        if index is None:
+            index = self.date_indexes[date] = len(self.dates)
+            self.dates.append(date)
+        return index
+
+    def add_commit(self, author_id, date):
+        """Adds a commit, and returns its row."""
+        self.commit_authors.append(author_id)
+        self.commit_dates.append(self.__date_index__(date))
+        return len(self.commit_authors) - 1
+
+    def add_diff(self, row, type, insertions, deletions):
+        """Adds a diff of the commit of a given row."""
+        self.diff_commits.append(row)
+        self.diff_types.append(type)
+        self.insertions.append(insertions)
+        self.deletions.append(deletions)
+
+    def add_other(self, row, name):
+        """Adds the name of an other file changed by the commit of a
+        given row, in addition to its diff."""
+        self.other_commits.append(row)
+        self.other_names.append(name)
+
+    def extend(self, other, ids=None):
+        """Appends the rows of another table, whose ids of the authors
+        are translated by the list `ids` when given."""
+        dates = [self.__date_index__(date) for date in other.dates]
+        rows = len(self.commit_authors)
+
+        self.commit_authors.extend(other.commit_authors if ids is None else
+                                   map(ids.__getitem__, other.commit_authors))
+        self.commit_dates.extend(map(dates.__getitem__, other.commit_dates))
+        self.diff_commits.extend(map(rows.__add__, other.diff_commits))
+        self.diff_types.extend(other.diff_types)
+        self.insertions.extend(other.insertions)
+        self.deletions.extend(other.deletions)
+        self.other_commits.extend(map(rows.__add__, other.other_commits))
+        self.other_names.extend(other.other_names)
+
+
+def combine(major, minor, size):
+    """Returns the column of the keys combining the values of two
+    columns, where the values of `minor` are in range(size)."""
+    if numpy is not None:
+        return __numpy__(major) * size + __numpy__(minor)
+    return array.array("q", map(int.__add__, map(size.__mul__, major), minor))
+
+
+def take(column, rows):
+    """Returns the column of the values of `column` at the given rows."""
+    if numpy is not None:
+        return __numpy__(column)[__numpy__(rows)]
+    return array.array("q", map(column.__getitem__, rows))
+
+
+def group_sums(keys, *columns):
+    """
+    Returns a hash associating each value of the column `keys` to the
+    tuple made of the number of rows having this key, followed by the
+    sums of the values of `columns` over these rows. The keys appear in
+    the order of their first rows.
+    """
+    if numpy is not None:
+        keys = __numpy__(keys)
+        order = numpy.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = numpy.flatnonzero(numpy.concatenate(
+            ([True], sorted_keys[1:] != sorted_keys[:-1]))) if len(keys) else order
+        counts = numpy.diff(numpy.append(starts, len(keys)))
+        sums = [numpy.add.reduceat(__numpy__(column)[order], starts) if len(keys) else counts
+                for column in columns]
+
+        # The stable sort puts the first row of each key first
+        first = numpy.argsort(order[starts], kind="stable")
+        return dict(zip(sorted_keys[starts][first].tolist(),
+                        zip(counts[first].tolist(), *[s[first].tolist() for s in sums])))
+
+    counts = collections.Counter(keys)
+    sums = []
+    for column in columns:
+        column_sums = dict.fromkeys(counts, 0)
+        for (key, value) in zip(keys, column):
+            column_sums[key] += value
+        sums.append(column_sums)
+    # The sums of the columns have the keys of the counts, in their order
+    return dict(zip(counts, zip(counts.values(), *[s.values() for s in sums])))
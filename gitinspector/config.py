@@ -19,7 +19,7 @@
 
 import ast
 import os
-from . import filtering, format, git_utils, interval
+from . import format, git_utils
 
 
 class GitConfig(object):
@@ -27,9 +27,13 @@ class GitConfig(object):
         self.run = run
         self.repo = repo
         self.global_only = global_only
+        self.settings = None
 
     def __read_git_config__(self, variable):
-        return git_utils.config(self.repo, variable, self.global_only)
+        # The whole section is read at once, by a single git process
+        if self.settings is None:
+            self.settings = git_utils.config(self.repo, "inspector", self.global_only)
+        return self.settings.get(variable, "")
 
     def __read_git_config_bool__(self, variable):
         variable = self.__read_git_config__(variable)
@@ -51,20 +55,24 @@ class GitConfig(object):
         if var[0]:
             self.run.config.file_types = var[1]
             for f in var[1].split(','):
-                filtering.__add_one_filter__("file_in:" + f, True)
+                self.run.context.filters.__add_one_filter__("file_in:" + f, True)
 
         var = self.__read_git_config_string__("exclude")
         if var[0]:
-            filtering.add_filters(var[1])
+            self.run.context.filters.add_filters(var[1])
 
         var = self.__read_git_config_string__("format")
-        if var[0] and not format.select(var[1]):
+        if var[0] and not self.run.context.select_format(var[1]):
             raise format.InvalidFormatError(_("specified output format not supported."))
 
         var = self.__read_git_config_string__("aliases")
         if var[0]:
             self.run.config.aliases = ast.literal_eval(var[1])
 
+        var = self.__read_git_config_string__("cache-dir")
+        if var[0]:
+            self.run.config.cache_dir = var[1]
+
         if self.__read_git_config_bool__("hard"):
             self.run.config.hard = True
         if self.__read_git_config_bool__("list-file-types"):
@@ -73,6 +81,8 @@ class GitConfig(object):
             self.run.config.localize_output = True
         if self.__read_git_config_bool__("metrics"):
             self.run.config.metrics = True
+        if self.__read_git_config_bool__("pathspecs"):
+            self.run.config.pathspecs = True
         if self.__read_git_config_bool__("responsibilities"):
             self.run.config.responsibilities = True
         if self.__read_git_config_bool__("weeks"):
@@ -80,11 +90,11 @@ class GitConfig(object):
 
         var = self.__read_git_config_string__("since")
         if var[0]:
-            interval.set_since(var[1])
+            self.run.context.interval.set_since(var[1])
 
         var = self.__read_git_config_string__("until")
         if var[0]:
-            interval.set_until(var[1])
+            self.run.context.interval.set_until(var[1])
 
         if self.__read_git_config_bool__("timeline"):
             self.run.config.timeline = True
@@ -0,0 +1,44 @@
+# coding: utf-8
+#
+# This file is part of gitinspector.
+#
+# gitinspector is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# gitinspector is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gitinspector. If not, see <http://www.gnu.org/licenses/>.
+
+from .changes import AuthorColors, Identities
+from .filtering import Filtering
+from .interval import Interval
+from . import format
+
+
+class Context(object):
+    """
+    The state of a run, namely its filters, the bounds on the dates of
+    the commits, the output format, the colors and the ids of the
+    authors. The context is passed through the analysis and the outputs
+    instead of being global, so that several runs can take place in a
+    process.
+    """
+    def __init__(self):
+        self.filters = Filtering()
+        self.interval = Interval()
+        self.format = format.DEFAULT_FORMAT
+        self.colors = AuthorColors()
+        self.identities = Identities()
+
+    def select_format(self, name):
+        self.format = name
+        return name in format.__available_formats__
+
+    def is_interactive_format(self):
+        return self.format == "text"
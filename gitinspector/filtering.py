@@ -23,9 +23,6 @@ from . import git_utils
 from enum import Enum
 import os
 
-# TODO: We definitely need to rewrite the 'filtering' module to be part
-# of the Runner context and NOT BEING GLOBAL! (for our own sake!)...
-
 class Filters(Enum):
     """
     An enumeration class representing the different filter types
@@ -37,130 +34,251 @@ class Filters(Enum):
     REVISION = "revision"
     MESSAGE  = "message"
 
-"""
-The first set containes compiled regexps.
-The second set contains matching strings.
-"""
-__filters__ = {
-    Filters.FILE_IN:  [set(), set()],
-    Filters.FILE_OUT: [set(), set()],
-    Filters.AUTHOR:   [set(), set()],
-    Filters.EMAIL:    [set(), set()],
-    Filters.REVISION: [set(), set()],
-    Filters.MESSAGE : [set(), None]
-}
+# The globs that git and fnmatch do not read the same way
+__unsafe_glob__ = re.compile(r"[\[\]\\]")
+
+# The regexps matching a plain string, made of characters that are not
+# special and of escaped punctuation
+__plain_regexp__ = re.compile(r"(?:[^\\.^$*+?{}\[\]|()]|\\[^0-9A-Za-z])+")
 
 class InvalidRegExpError(ValueError):
     def __init__(self, msg):
         super(InvalidRegExpError, self).__init__(msg)
         self.msg = msg
 
-def __add_one_filter__(string,is_globbing=False):
+class Filtering(object):
     """
-    Function that takes a string and records the corresponding filter
-    inside __filters__.
-    Syntax: <filter_prefix>:<globbing_pattern>
+    The filters of a run, associating each type of filter to a pair
+    of sets : the first set contains compiled regexps, the second set
+    contains matching strings.
     """
-    split_rule = string.strip().split(":")
-    if len(split_rule) != 2:
+    def __init__(self):
+        self.__filters__ = {}
+        self.clear()
+
+    def __add_one_filter__(self, string, is_globbing=False):
+        """
+        Function that takes a string and records the corresponding filter
+        inside __filters__.
+        Syntax: <filter_prefix>:<globbing_pattern>
+        """
+        split_rule = string.strip().split(":")
+        if len(split_rule) != 2:
+            raise ValueError("Invalid filter : %s"%string)
+        for filter in Filters:
+            if filter.value == split_rule[0]:
+                if is_globbing:
+                    pattern = fnmatch.translate(split_rule[1])
+                    self.__globs__.add(pattern)
+                else:
+                    pattern = split_rule[1]
+                if filter == Filters.FILE_IN:
+                    self.__add_file_in_glob__(split_rule[1] if is_globbing else None)
+                self.__filters__[filter][0].add(re.compile(pattern))
+                self.__clear_memos__()
+                return
         raise ValueError("Invalid filter : %s"%string)
-    for filter in Filters:
-        if filter.value == split_rule[0]:
-            if is_globbing:
-                pattern = fnmatch.translate(split_rule[1])
+
+    def __add_file_in_glob__(self, glob):
+        """
+        Records the glob of a FILE_IN filter, or None if the filter is
+        a regexp. The FILE_IN filters only have pathspecs if all of them
+        are globs.
+        """
+        if self.__file_in_globs__ is not None:
+            if glob is None:
+                self.__file_in_globs__ = None
             else:
-                pattern = split_rule[1]
-            __filters__[filter][0].add(re.compile(pattern))
-            return
-    raise ValueError("Invalid filter : %s"%string)
+                self.__file_in_globs__.add(glob)
 
-def add_filters(string):
-    """
-    Add a set of filters, separated by commas. The syntax corresponds
-    to the --exclude option on the command-line. If KEY is missing
-    somehow, the filter is automatically Filters.FILE_IN".
-    """
-    rules = string.split(",")
-    for rule in rules:
-        __add_one_filter__(rule)
+    def add_filters(self, string):
+        """
+        Add a set of filters, separated by commas. The syntax corresponds
+        to the --exclude option on the command-line. If KEY is missing
+        somehow, the filter is automatically Filters.FILE_IN".
+        """
+        rules = string.split(",")
+        for rule in rules:
+            self.__add_one_filter__(rule)
 
-def clear():
-    for filter in Filters:
-        __filters__[filter] = [set(), set()]
+    def clear(self):
+        for filter in Filters:
+            self.__filters__[filter] = [set(), set()]
+        self.__revisions__ = set() # Revisions filtered by their messages
+        self.__globs__ = set()     # Patterns translated from globs
+        self.__file_in_globs__ = set()
+        self.__clear_memos__()
 
-def get_filtered(filter_type=Filters.FILE_IN):
-    return __filters__[filter_type][1]
+    def __clear_memos__(self):
+        """
+        Forgets the verdicts on the file names, which have to be computed
+        again when the filters change.
+        """
+        self.__matchers__ = {}       # Filter -> regexps
+        self.__file_names__ = {}     # File name -> acceptable or not
+        self.__excluded_dirs__ = {}  # Directory -> excluded or not
 
-def has_filtered():
-    """
-    Returns True iff there is at least one active filter.
-    """
-    for filter in Filters:
-        if __filters__[filter][1]:
+    def merge(self, other):
+        """
+        Add the regexps and the matching strings of other filters, for
+        example the ones of another process, to __filters__.
+        """
+        for filter in Filters:
+            for (ours, theirs) in zip(self.__filters__[filter], other.__filters__[filter]):
+                ours.update(theirs)
+        self.__globs__.update(other.__globs__)
+        self.__clear_memos__()
+
+    def get_pathspecs(self):
+        """
+        Returns a list of git pathspecs matching at least the file names
+        accepted by the filters, so that git can leave the other files
+        out of its output. The regexp of a FILE_IN glob is searched in
+        the whole file name, and matches the same names as the glob
+        prefixed by '*', unless the glob has a character class or an
+        escape, which git reads differently. A FILE_OUT filter given as
+        a plain string excludes the names containing it. The other
+        filters have no pathspec, and the file names still have to be
+        checked by is_acceptable_file_name.
+        """
+        pathspecs = []
+        globs = self.__file_in_globs__
+        if globs and all(g.strip("*") for g in globs) and \
+           not any(__unsafe_glob__.search(g) for g in globs):
+            pathspecs = sorted("*" + g for g in globs)
+
+        for regexp in sorted(self.__filters__[Filters.FILE_OUT][0], key=lambda r: r.pattern):
+            if regexp.pattern not in self.__globs__ and __plain_regexp__.fullmatch(regexp.pattern):
+                string = re.sub(r"\\(.)", r"\1", regexp.pattern)
+                if not __unsafe_glob__.search(string) and "*" not in string and "?" not in string:
+                    pathspecs.append(":(exclude)*" + string + "*")
+        return pathspecs
+
+    def get_filtered(self, filter_type=Filters.FILE_IN):
+        return self.__filters__[filter_type][1]
+
+    def has_filtered(self):
+        """
+        Returns True iff there is at least one active filter.
+        """
+        for filter in Filters:
+            if self.__filters__[filter][1]:
+                return True
+        return False
+
+    def has_filters(self, filter_type):
+        """
+        Returns True iff there is at least one regexp for the given type
+        of filter.
+        """
+        return bool(self.__filters__[filter_type][0])
+
+    def is_filtered(self, string, filter_type):
+        """
+        The function that tests whether 'string' passes the filters
+        defined in __filters__. The test on the string parameter depends
+        on the filter_type. This function should not be used with the
+        filters on file names (cf. is_acceptable_file_name) nor on the
+        messages (cf. is_filtered_message).
+        """
+
+        if filter_type in (Filters.FILE_IN, Filters.FILE_OUT, Filters.MESSAGE):
+            raise ValueError("Should not use that filter this way")
+
+        string = string.strip()
+        if not string:
+            return False
+
+        if filter_type == Filters.REVISION and string in self.__revisions__:
+            self.__filters__[filter_type][1].add(string)
             return True
-    return False
 
-def is_filtered(string, filter_type):
-    """
-    The function that tests whether 'string' passes the filters
-    defined in __filters__. The test on the string parameter depends
-    on the filter_type. This function should not be used with the
-    filters on file names (cf. is_acceptable_file_name).
-    """
+        for regexp in self.__filters__[filter_type][0]:
+            try:
+                if regexp.search(string) is not None:
+                    self.__filters__[filter_type][1].add(string)
+                    return True
+            except:
+                raise InvalidRegExpError(_("Invalid regular expression specified"))
 
-    if (filter_type == Filters("file_in")) or (filter_type == Filters("file_out")):
-        raise "Should not use that filter this way"
+        return False
+
+    def is_filtered_message(self, sha, message):
+        """
+        Tests whether the message of the commit 'sha', given as read from
+        git, passes the MESSAGE filters. The revision of a filtered
+        commit is filtered as well, so that its rows are not blamed.
+        """
+        if not self.__filters__[Filters.MESSAGE][0]:
+            return False
+
+        message = git_utils.decode_message(message)
+        for regexp in self.__filters__[Filters.MESSAGE][0]:
+            try:
+                if regexp.search(message) is not None:
+                    self.__revisions__.add(sha.strip())
+                    return True
+            except:
+                raise InvalidRegExpError(_("Invalid regular expression specified"))
 
-    string = string.strip()
-    if not string:
         return False
 
-    for regexp in __filters__[filter_type][0]:
-        if filter_type == Filters.MESSAGE:
-            search_for = git_utils.commit_message(string)
-        else:
-            search_for = string
+    def is_acceptable_file_name(self, string):
+        """
+        The function that tests whether 'string' passes the filters
+        according to the configuration for file names. First, the filename
+        must pass at least one positive check (in FILE_IN), and second, it
+        must not belong to any negative check (in FILE_OUT). The verdict
+        on a file name is only computed once.
+        """
+        search_for = string.strip()
+        verdict = self.__file_names__.get(search_for, None)
+        if verdict is None:
+            if not(self._matches_filter(search_for, Filters.FILE_IN)):
+                verdict = False
+            elif self._matches_filter(search_for, Filters.FILE_OUT):
+                self.__filters__[Filters.FILE_OUT][1].add(self._find_excluded_top_dir(search_for))
+                verdict = False
+            else:
+                verdict = True
+            self.__file_names__[search_for] = verdict
+        return verdict
+
+    def __get_matchers__(self, filter):
+        """
+        Returns the regexps of a type of filter, where the patterns
+        translated from globs are combined into a single regexp.
+        """
+        matchers = self.__matchers__.get(filter, None)
+        if matchers is None:
+            regexps = self.__filters__[filter][0]
+            globs = [r.pattern for r in regexps if r.pattern in self.__globs__]
+            matchers = [r for r in regexps if r.pattern not in self.__globs__]
+            if globs:
+                matchers.insert(0, re.compile("|".join(sorted(globs))))
+            self.__matchers__[filter] = matchers
+        return matchers
 
+    def _matches_filter(self, string, filter):
         try:
-            if regexp.search(search_for) is not None:
-                if filter_type == Filters.MESSAGE:
-                    __add_one_filter__("revision:" + string) # ??
-                else:
-                    __filters__[filter_type][1].add(string)
-                return True
+            for regexp in self.__get_matchers__(filter):
+                if regexp.search(string) is not None:
+                    return True
         except:
             raise InvalidRegExpError(_("Invalid regular expression specified"))
-
-    return False
-
-def is_acceptable_file_name(string):
-    """
-    The function that tests whether 'string' passes the filters
-    according to the configuration for file names. First, the filename
-    must pass at least one positive check (in FILE_IN), and second, it
-    must not belong to any negative check (in FILE_OUT)
-    """
-    search_for = string.strip()
-    if not(_matches_filter(search_for, Filters.FILE_IN)):
-        return False
-    if _matches_filter(search_for, Filters.FILE_OUT):
-        __filters__[Filters.FILE_OUT][1].add(_find_excluded_top_dir(search_for))
         return False
-    return True
 
-def _matches_filter(string, filter):
-    try:
-        for regexp in __filters__[filter][0]:
-            if regexp.search(string) is not None:
-                return True
-    except:
-        raise InvalidRegExpError(_("Invalid regular expression specified"))
-    return False
-
-def _find_excluded_top_dir(path):
-    previous_path = path
-    new_path = os.path.dirname(path)
-    while len(new_path) > 0 and _matches_filter(new_path + "/", Filters.FILE_OUT):
-        previous_path = new_path
-        new_path = os.path.dirname(new_path)
-    return previous_path
+    def __is_excluded_dir__(self, path):
+        excluded = self.__excluded_dirs__.get(path, None)
+        if excluded is None:
+            excluded = self._matches_filter(path + "/", Filters.FILE_OUT)
+            self.__excluded_dirs__[path] = excluded
+        return excluded
+
+    def _find_excluded_top_dir(self, path):
+        previous_path = path
+        new_path = os.path.dirname(path)
+        while len(new_path) > 0 and self.__is_excluded_dir__(new_path):
+            previous_path = new_path
+            new_path = os.path.dirname(new_path)
+        return previous_path
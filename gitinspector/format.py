@@ -29,25 +29,11 @@ __available_formats__ = ["html", "htmlembedded", "json", "text", "xml"]
 
 DEFAULT_FORMAT = __available_formats__[3]
 
-__selected_format__ = DEFAULT_FORMAT
-
 class InvalidFormatError(Exception):
     def __init__(self, msg):
         super(InvalidFormatError, self).__init__(msg)
         self.msg = msg
 
-def select(format):
-    global __selected_format__
-    __selected_format__ = format
-
-    return format in __available_formats__
-
-def get_selected():
-    return __selected_format__
-
-def is_interactive_format():
-    return __selected_format__ == "text"
-
 def __output_html_template__(name):
     template_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), name)
     file_r = open(template_path, "rb")
@@ -67,10 +53,11 @@ def output_header(runner):
     different Javascript files that are included or not inside the
     output.
     """
+    selected_format = runner.context.format
     repos = runner.repos
     repos_string = ", ".join([repo.name for repo in repos])
 
-    if __selected_format__ == "html" or __selected_format__ == "htmlembedded":
+    if selected_format == "html" or selected_format == "htmlembedded":
         base = basedir.get_basedir()
         html_header = __output_html_template__(base + "/templates/header.html")
 
@@ -79,7 +66,7 @@ def output_header(runner):
         logo_file.close()
         logo = base64.b64encode(logo)
 
-        if __selected_format__ == "htmlembedded":
+        if selected_format == "htmlembedded":
             jquery_js = "<script type='application/javascript'>" + \
                 __output_html_template__(base + "/html/jquery.min.js") + "</script>"
             d3_js = "<script type='application/javascript'>" + \
@@ -134,7 +121,7 @@ def output_header(runner):
                                hide_minor_authors=_("Hide minor authors"),
                                show_minor_rows=_("Show rows with minor work"),
                                hide_minor_rows=_("Hide rows with minor work")))
-    elif __selected_format__ == "json":
+    elif selected_format == "json":
         runner.out.writeln("{\n\t\"gitinspector\": {")
         runner.out.writeln("\t\t\"version\": \"" + version.__version__ + "\",")
 
@@ -150,7 +137,7 @@ def output_header(runner):
 
         runner.out.writeln("\t\t\"report_date\": \"" + time.strftime("%Y/%m/%d") + "\",")
 
-    elif __selected_format__ == "xml":
+    elif selected_format == "xml":
         runner.out.writeln("<gitinspector>")
         runner.out.writeln("\t<version>" + version.__version__ + "</version>")
 
@@ -179,11 +166,12 @@ def output_footer(runner):
     """
     The function responsible for outputting a footer to the output.
     """
-    if __selected_format__ == "html" or __selected_format__ == "htmlembedded":
+    selected_format = runner.context.format
+    if selected_format == "html" or selected_format == "htmlembedded":
         base = basedir.get_basedir()
         html_footer = __output_html_template__(base + "/templates/footer.html")
         runner.out.writeln(html_footer)
-    elif __selected_format__ == "json":
+    elif selected_format == "json":
         runner.out.writeln("\n\t}\n}")
-    elif __selected_format__ == "xml":
+    elif selected_format == "xml":
         runner.out.writeln("</gitinspector>")
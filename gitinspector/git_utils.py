@@ -17,14 +17,24 @@
 # You should have received a copy of the GNU General Public License
 # along with gitinspector. If not, see <http://www.gnu.org/licenses/>.
 
-import itertools
+import os
+import re
 import subprocess
 
+from shlex import quote, split
 
-def local_branches():
+
+def __git__(repo):
+    """Returns the beginning of a git command run in the repository
+    located at `repo`, or in the current directory if `repo` is None.
+    """
+    return ["git"] if repo is None else ["git", "-C", repo]
+
+
+def local_branches(repo):
     """Returns the list of branches appearing as local references.
     """
-    branch_p = subprocess.Popen(["git", "branch", "--format=%(refname)"], bufsize=1,
+    branch_p = subprocess.Popen(__git__(repo) + ["branch", "--format=%(refname)"], bufsize=1,
                                 stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
     branches = branch_p.communicate()[0].splitlines()
     branches = [ b.decode("utf-8", "replace") for b in branches ]
@@ -34,52 +44,144 @@ def local_branches():
     return branches
 
 
-def last_commit(branch, file):
-    """Returns the date for the last commit on a file in a branch, in the
-       Unix format, 0 if the file does not belong to the branch.
-    """
-    log_p = subprocess.Popen(["git", "log", "-1", "--format=%at", branch, file], bufsize=1,
-                             stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-    date_s = log_p.communicate()[0].strip().decode("utf-8")
-    try:
-        date = int(date_s)
-    except ValueError:
-        date = 0
-    log_p.wait()
-    log_p.stdout.close()
-    return date
-
-
-def sanitize_filename(file):
-    file = file.strip().decode("unicode_escape", "ignore")
-    file = file.encode("latin-1", "replace")
-    file = file.decode("utf-8", "replace").strip("\"").strip("'").strip()
-    return file
+# The SHA of the tree with no entry
+EMPTY_TREE = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
 
 
-def files(branch, config):
-    """Returns the list of the files appearing in the given branch.
+def tree_entries(repo, branch, config, pathspecs=None):
+    """Returns a hash associating the files appearing in the given
+    branch to pairs (object, size), where object is the SHA of the
+    blob and size is in bytes. If `pathspecs` is given, only the files
+    matching them are listed.
     """
-    ls_command = ["git", "ls-tree", "--name-only", "-r", branch]
+    if pathspecs:
+        return __matching_tree_entries__(repo, branch, config, pathspecs)
+
+    ls_command = __git__(repo) + ["ls-tree", "-l", "-r", "-z", branch]
 
     if config.debug_mode:
         print(" ".join(ls_command))
 
-    ls_tree_p = subprocess.Popen(ls_command, bufsize=1,
-                                 stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-    lines = ls_tree_p.communicate()[0].splitlines()
-    lines = [ sanitize_filename(l) for l in lines ]
+    ls_tree_p = subprocess.Popen(ls_command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    entries = ls_tree_p.communicate()[0].split(b"\0")
     ls_tree_p.wait()
     ls_tree_p.stdout.close()
-    return lines
+
+    # Each entry is "<mode> <type> <object> <size>\t<file>"
+    objects = {}
+    for entry in entries:
+        info, tab, file = entry.partition(b"\t")
+        if tab:
+            info = info.split()
+            size = int(info[-1]) if info[-1].isdigit() else 0
+            objects[file.decode("utf-8", "replace")] = (info[2].decode("ascii"), size)
+    return objects
+
+
+def __matching_tree_entries__(repo, branch, config, pathspecs):
+    """Same as tree_entries, for the files matching `pathspecs`. The
+    pathspecs given to ls-tree cannot have wildcards, so the files are
+    listed as the differences with the empty tree, and their sizes are
+    then read by a single cat-file process.
+    """
+    diff_command = __git__(repo) + ["diff-tree", "-r", "-z", "--no-renames",
+                                    EMPTY_TREE, branch, "--"] + pathspecs
+
+    if config.debug_mode:
+        print(" ".join(diff_command))
+
+    diff_tree_p = subprocess.Popen(diff_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    tokens = diff_tree_p.communicate()[0].split(b"\0")
+
+    # Each entry is ":<mode> <mode> <object> <object> <status>\0<file>\0"
+    blobs = {}
+    for (info, file) in zip(tokens[0::2], tokens[1::2]):
+        info = info.split()
+        if len(info) == 5:
+            blobs[file.decode("utf-8", "replace")] = info[3].decode("ascii")
+
+    objects = set(blobs.values())
+    cat_file_p = subprocess.Popen(__git__(repo) + ["cat-file", "--batch-check"],
+                                  stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    lines = cat_file_p.communicate("".join(o + "\n" for o in objects).encode("ascii"))[0]
+
+    # Each line is "<object> <type> <size>", or "<object> missing" for
+    # the commits of the submodules
+    sizes = {}
+    for line in lines.splitlines():
+        info = line.split()
+        if len(info) == 3 and info[2].isdigit():
+            sizes[info[0].decode("ascii")] = int(info[2])
+
+    return {f: (obj, sizes.get(obj, 0)) for f, obj in blobs.items()}
+
+
+def files(repo, branch, config, pathspecs=None):
+    """Returns a hash associating the files appearing in the given
+    branch to their sizes (in bytes). If `pathspecs` is given, only the
+    files matching them are listed.
+    """
+    return {f: size for f, (obj, size) in tree_entries(repo, branch, config, pathspecs).items()}
+
+
+__commit_line__ = re.compile(b"([0-9a-f]{40}) ([0-9]+)(\n|$)")
+
+
+def __last_changes__(repo, revision, config, options, pathspecs=None):
+    """Returns a hash associating the files appearing in the history of
+    the given revision, and matching `pathspecs` if given, to pairs
+    (sha, time) describing the last commit changing them, where time is
+    the author time in the Unix format.
+    """
+    git_command = __git__(repo) + ["log", "-z", "--pretty=format:%H %at", "--name-only"] + \
+        options + [revision] + (["--full-history", "--"] + pathspecs if pathspecs else [])
+
+    if config.debug_mode:
+        print(" ".join(git_command))
+
+    git_log_r = subprocess.Popen(git_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    changes = {}
+    try:
+        commit = None
+        for token in __read_tokens__(git_log_r.stdout):
+            # A commit is "<sha> <time>\n<file>\0<file>\0...\0", and the
+            # commits are separated by an extra NUL
+            match = __commit_line__.match(token)
+            if match:
+                commit = (match.group(1).decode("ascii"), int(match.group(2)))
+                token = token[match.end():]
+            if token:
+                changes.setdefault(token.decode("utf-8", "replace"), commit)
+    finally:
+        git_log_r.stdout.close()
+        git_log_r.wait()
+    return changes
+
+
+def last_changes(repo, sha, config, pathspecs=None):
+    """Returns a hash associating the files appearing in the history of
+    the given commit, and matching `pathspecs` if given, to the SHA of
+    the last commit changing them.
+    """
+    return {f: c[0] for f, c in __last_changes__(repo, sha, config, [], pathspecs).items()}
+
+
+def last_change_times(repo, branch, config, pathspecs=None):
+    """Returns a hash associating the files appearing in the history of
+    the given branch, and matching `pathspecs` if given, to the date of
+    the last commit changing them, in the Unix format. A merge commit
+    changes the files that differ from all its parents. The dates of
+    all the files are read in a single pass over the history.
+    """
+    return {f: c[1] for f, c in __last_changes__(repo, branch, config, ["-c"], pathspecs).items()}
 
 
-def commits(branch, since, until):
+def commits(repo, branch, since, until):
     """Returns a list of SHA for the commits in the given branch, for the
     given duration.
     """
-    git_command = filter(None, ["git", "rev-list", "--reverse", # "--no-merges", # For oavsa
-                                since, until, branch])
+    git_command = filter(None, __git__(repo) + ["rev-list", "--reverse", # "--no-merges", # For oavsa
+                                               since, until, branch])
     git_rev_list_p = subprocess.Popen(git_command, bufsize=1,
                                       stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
     lines = git_rev_list_p.communicate()[0].splitlines()
@@ -88,57 +190,223 @@ def commits(branch, since, until):
     return lines
 
 
-def commit_chunks(hashes, since, until, config):
-    """Returns a list of commits containing the commit data with the
-    filediffs. Returned is a list of chunks, each chunk being one
-    commit represented by a list of lines. The return of this function
-    is intended to be handled by Commit.handle_diff_chunk.
+def git_dir(repo):
+    """Returns the absolute path of the git directory of a repository.
+    """
+    git_rev_parse_p = subprocess.Popen(__git__(repo) + ["rev-parse", "--git-dir"],
+                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    path = git_rev_parse_p.communicate()[0].strip().decode("utf-8", "replace")
+    return os.path.abspath(os.path.join(repo or "", path))
+
+
+def rev_parse(repo, revision):
+    """Returns the SHA of the commit designated by `revision`, or None
+    if there is no such commit in the repository.
+    """
+    git_rev_parse_p = subprocess.Popen(__git__(repo) + ["rev-parse", "--verify", "--quiet",
+                                                        revision + "^{commit}"],
+                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    sha = git_rev_parse_p.communicate()[0].strip().decode("ascii", "replace")
+    return sha if git_rev_parse_p.returncode == 0 else None
+
+
+def absolute_dates(repo, *options):
+    """Returns the Unix timestamps of the dates given to git as the
+    options `options` (--since and --until, quoted for the shell, the
+    empty ones being ignored), as the options of git rev-list that are
+    their equivalents. The relative dates, such as 2.weeks, are thereby
+    turned into the dates they designate at the time of the call.
+    """
+    args = [a for o in options if o for a in split(o)]
+    if not args:
+        return []
+
+    git_rev_parse_p = subprocess.Popen(__git__(repo) + ["rev-parse"] + args,
+                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return git_rev_parse_p.communicate()[0].decode("ascii", "replace").split()
+
+
+def remote_head(url):
+    """Returns the SHA of the HEAD of the remote repository located at
+    `url`, or None if it cannot be read. The repository is not cloned.
+    """
+    git_ls_remote_p = subprocess.Popen(__git__(None) + ["ls-remote", url, "HEAD"],
+                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    lines = git_ls_remote_p.communicate()[0].splitlines()
+    if git_ls_remote_p.returncode != 0 or not lines:
+        return None
+    return lines[0].split(b"\t")[0].decode("ascii", "replace")
+
+
+def tips(repo, hashes):
+    """Returns the list of SHA of the commits designated by `hashes`
+    (for example a branch name or '--all'), without walking the history.
+    """
+    git_command = __git__(repo) + ["rev-list", "--no-walk"] + hashes.split()
+    git_rev_list_p = subprocess.Popen(git_command, stdout=subprocess.PIPE,
+                                      stderr=subprocess.PIPE)
+    lines = git_rev_list_p.communicate()[0].splitlines()
+    return [l.decode("ascii") for l in lines]
+
+
+def are_ancestors(repo, old_tips, new_tips):
+    """Tests if all the commits of `old_tips` are reachable from the
+    commits of `new_tips`, namely that no history has been rewritten.
+    """
+    git_command = __git__(repo) + ["rev-list", "-n", "1"] + old_tips + ["--not"] + new_tips
+    git_rev_list_p = subprocess.Popen(git_command, stdout=subprocess.PIPE,
+                                      stderr=subprocess.PIPE)
+    output = git_rev_list_p.communicate()[0]
+    return git_rev_list_p.returncode == 0 and not output.strip()
+
+
+def __read_tokens__(stream, separator=b"\0", size=65536):
+    """Generates the tokens of a binary stream separated by `separator`,
+    while reading it.
+    """
+    remainder = b""
+    for data in iter(lambda: stream.read(size), b""):
+        tokens = (remainder + data).split(separator)
+        remainder = tokens.pop()
+        yield from tokens
+    if remainder:
+        yield remainder
+
+
+def commit_chunks(repo, hashes, since, until, config, messages=False, pathspecs=None):
+    """Generates the commits containing the commit data with the
+    filediffs, one at a time while reading the output of git. Each
+    chunk is one commit represented by a list, so that the memory used
+    is bounded by the size of the largest commit. The chunks are
+    intended to be handled by Commit.handle_diff_chunk.
+
+    The first element of a chunk is the commit line, the following
+    ones are triples (insertions, deletions, file name) read from the
+    NUL-separated '--numstat' output, where insertions and deletions
+    are None for binary files, and the file name is left raw (bytes).
+
+    The commits reachable from the baseline of the configuration, if
+    any, are not walked. If `messages` is True, the commit line is
+    followed by a record separator (0x1e) and the raw commit message.
+    If `pathspecs` is given, only the commits changing the files
+    matching them are read, along with the diffs of these files.
     """
     git_command = list(filter(None,
-                         ["git", "log", "--reverse",
-                          "--pretty='---%n%ct|%cd|%H|%aN|%aE'",
-                          "--stat=100000,8192"] +
+                         [quote(arg) for arg in __git__(repo)] +
+                         ["log", "--reverse", "-z",
+                          "--pretty='%ct|%cd|%H|%aN|%aE" + ("%x1e%B" if messages else "") + "'",
+                          "--numstat"] +
                          (["-w"] if config.ignore_space else []) +
                          [since, until, "--date=short"] +
                          (["-C", "-C", "-M"] if config.hard else []) +
-                         [hashes]))
+                         [hashes] +
+                         (["^" + quote(config.baseline)] if config.baseline else []) +
+                         (["--full-history", "--"] + [quote(p) for p in pathspecs]
+                          if pathspecs else [])))
     git_command = " ".join(git_command)
     if config.debug_mode:
         print(git_command)
 
-    git_log_r = subprocess.Popen(git_command,
-                                 bufsize=1, stdout=subprocess.PIPE, shell=True)
-    lines = git_log_r.stdout.readlines()
-    git_log_r.wait()
-    git_log_r.stdout.close()
-    chunks = [ list(g) for (k,g) in itertools.groupby(lines, key=lambda l: l==b'---\n') ]
-    chunks = list(filter(lambda g: g[0] != b'---\n', chunks))
-    return chunks
+    git_log_r = subprocess.Popen(git_command, stdout=subprocess.PIPE, shell=True)
+    try:
+        chunk = None
+        tokens = __read_tokens__(git_log_r.stdout)
+        for token in tokens:
+            # The filediffs of a commit are separated from its commit line by a LF
+            fields = token.lstrip(b"\n").split(b"\t", 2)
+            if len(fields) == 3 and (fields[0].isdigit() or fields[0] == b"-"):
+                (insertions, deletions, file_name) = fields
+                if not file_name: # Renames and copies are "\0<old name>\0<new name>"
+                    next(tokens)
+                    file_name = next(tokens)
+                if insertions == b"-": # Binary file
+                    chunk.append((None, None, file_name))
+                else:
+                    chunk.append((int(insertions), int(deletions), file_name))
+            else:
+                if chunk is not None:
+                    yield chunk
+                chunk = [token]
+        if chunk is not None:
+            yield chunk
+    finally:
+        git_log_r.stdout.close()
+        git_log_r.wait()
+
+
+class BlobReader(object):
+    """A long-lived `git cat-file --batch` process through which the
+    contents of many objects can be streamed, instead of spawning one
+    `git show` process per object. Can be used as a context manager.
+    """
+    def __init__(self, repo):
+        self.cat_file_p = subprocess.Popen(__git__(repo) + ["cat-file", "--batch"],
+                                           stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def __enter__(self):
+        return self
 
+    def __exit__(self, *args):
+        self.close()
 
-def commit_message(hash):
+    def read(self, obj):
+        """Returns the contents of an object given as <ref>:<path> (or as
+        any other object name), as bytes, or None if it is missing.
+        """
+        self.cat_file_p.stdin.write(obj.encode("utf-8") + b"\n")
+        self.cat_file_p.stdin.flush()
+
+        # The header is "<sha> <type> <size>", or "<obj> missing"
+        header = self.cat_file_p.stdout.readline().split()
+        if not header or header[-1] in (b"missing", b"ambiguous"):
+            return None
+
+        contents = self.cat_file_p.stdout.read(int(header[-1]))
+        self.cat_file_p.stdout.read(1) # The contents are followed by a LF
+        return contents
+
+    def close(self):
+        self.cat_file_p.stdin.close()
+        self.cat_file_p.wait()
+        self.cat_file_p.stdout.close()
+
+
+def commit_message(repo, hash):
     """Returns the commit message of a given hash, as a list of strings"""
-    git_command = filter(None, ["git", "show", "-s",
-                                "--pretty=%B", hash])
+    git_command = filter(None, __git__(repo) + ["show", "-s",
+                                               "--pretty=%B", hash])
     git_show_r = subprocess.Popen(git_command, bufsize=1, stdout=subprocess.PIPE)
     message = git_show_r.stdout.read() # all lines in one go
     git_show_r.wait()
     git_show_r.stdout.close()
 
+    return decode_message(message)
+
+
+def decode_message(message):
+    """Returns a commit message read from git as bytes, as a string"""
     message = message.strip().decode("unicode_escape", "ignore")
     message = message.encode("latin-1", "replace")
     return message.decode("utf-8", "replace")
 
 
-def blames(sha, filename, config):
+def blames(repo, sha, filename, config, since=""):
     """Returns a list of data representing the blames for a file on a
-    given branch.
+    given branch. The rows coming from the baseline of the
+    configuration, if any, or from the commits older than `since`, are
+    blamed on boundary commits, where git stops walking the history.
+    With a baseline, the root commits of the repository are not taken
+    for boundary commits, as they do not come from the baseline.
     """
     blame_command = list(filter(None,
-                           ["git", "blame", "--line-porcelain"] +
+                           [quote(arg) for arg in __git__(repo)] +
+                           ["blame", "--porcelain", since] +
+                           (["--root"] if config.baseline else []) +
                            (["-w"] if config.ignore_space else []) +
                            (["-C", "-C", "-M"] if config.hard else []) +
-                           [sha, "--", filename]))
+                           [sha] +
+                           (["^" + quote(config.baseline)] if config.baseline else []) +
+                           ["--", quote(filename)]))
     blame_command = " ".join(blame_command)
     if config.debug_mode:
         print(blame_command)
@@ -152,19 +420,25 @@ def blames(sha, filename, config):
     return rows
 
 
-def config(repo, variable, global_only):
-    """Returns the value of a variable configured in a repository.
+def config(repo, section, global_only):
+    """Returns a hash associating the variables configured in a section
+    of the configuration of a repository to their values, read by a
+    single git process. The names of the variables are in lower case,
+    and a variable with no value is associated to an empty string.
     """
-    setting_cmd = subprocess.Popen(filter(None, ["git", "-C", repo, "config",
-                                                 "--global" if global_only else "",
-                                                 "inspector." + variable]), bufsize=1,
-                                   stdout=subprocess.PIPE)
-    setting_cmd.wait()
-
-    try:
-        setting = setting_cmd.stdout.readlines()[0].strip().decode("utf-8", "replace")
-    except IndexError:
-        setting = ""
+    config_cmd = subprocess.Popen(filter(None, __git__(repo) + ["config", "-z",
+                                                               "--global" if global_only else "",
+                                                               "--get-regexp",
+                                                               "^" + re.escape(section) + r"\."]),
+                                  stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    entries = config_cmd.communicate()[0].split(b"\0")
 
-    setting_cmd.stdout.close()
-    return setting
+    # Each entry is "<section>.<variable>\n<value>", the last value of
+    # a variable given several times being the one that applies
+    settings = {}
+    for entry in entries:
+        (key, _sep, value) = entry.decode("utf-8", "replace").partition("\n")
+        if key:
+            value = value.splitlines()
+            settings[key[len(section) + 1:]] = value[0].strip() if value else ""
+    return settings
@@ -20,19 +20,26 @@
 import argparse
 import ast
 import atexit
+import concurrent.futures
+import copy
 import datetime
 import io
+import itertools
+import multiprocessing
 import os
 import sys
 
+from urllib.parse import urlparse
+
 from .blame import Blame
 from .changes import Changes
 from .config import GitConfig
+from .context import Context
 from .git_utils import local_branches
 from .messages import error, warning, debug
 from .metrics import MetricsLogic
 from .repository import Repository
-from . import (basedir, filtering, format, interval,
+from . import (basedir, batch, cache, filtering, format, git_utils,
                localization, terminal, version)
 from .output import outputable
 
@@ -83,28 +90,32 @@ class Runner(object):
     def __init__(self, config, writer):
         self.config = config  # Namespace object containing the config
         self.out = writer     # Buffer for containing the output
+        self.context = Context()
 
         # Initialize the filters
-        filtering.clear()
         if config.exclude:
             for pat in config.exclude:
-                filtering.add_filters(pat)
+                self.context.filters.add_filters(pat)
         for f in config.file_types.split(','):
-            filtering.__add_one_filter__("file_in:" + f, True)
+            self.context.filters.__add_one_filter__("file_in:" + f, True)
 
         # Initialize a list of Repository objects
         self.repos = __get_validated_git_repos__(config)
+        config.baseline = __get_baseline__(config, self.repos)
         # We need the repos above to be set before we read the git config.
         GitConfig(self, self.repos[-1].location).read()
+        if config.cache_dir and not cache.is_safe_dir(config.cache_dir):
+            error(_("{0}: the cache directory must belong to the current user and must not be "
+                    "writable by the others").format(config.cache_dir))
         # Initialize extensions and formats
-        format.select(config.format)
+        self.context.select_format(config.format)
 
         # Initialize bounds on commits dates
-        interval.clear()
+        self.context.interval.clear()
         if config.since:
-            interval.set_since(config.since.isoformat())
+            self.context.interval.set_since(config.since.isoformat())
         if config.until:
-            interval.set_until(config.until.isoformat())
+            self.context.interval.set_until(config.until.isoformat())
 
         # The following objects are additive : they begin empty, and
         # then one instance is added to the Runner for each repository
@@ -124,27 +135,46 @@ class Runner(object):
 
         terminal.skip_escapes(not sys.stdout.isatty())
         terminal.set_stdout_encoding()
-        previous_directory = os.getcwd()
-
-        for repo in self.repos:
-            os.chdir(repo.location)
 
-            # Initialize the branches
-            if self.config.branch == "--all":
-                self.config.branches = local_branches()
-
-            repo = repo if len(self.repos) > 1 else None
-            repo_changes = Changes(repo, self.config)
-            self.blames += Blame(repo, repo_changes, self.config)
-            self.changes += repo_changes
+        # The repositories are analyzed concurrently by a pool of
+        # processes, sharing the workers blaming the files. The aliases
+        # learnt with --merge-authors have to be shared by all the
+        # repositories, which are then analyzed in turn.
+        workers = min(len(self.repos), self.config.jobs)
+        if workers > 1 and not self.config.merge_authors:
+            config = copy.copy(self.config)
+            config.jobs = max(1, self.config.jobs // workers)
+
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+                                                        initializer=localization.init) as executor:
+                results = executor.map(__load_repository__, self.repos,
+                                       itertools.repeat(config), itertools.repeat(self.context))
+                for (repo_changes, repo_blames, repo_metrics, filters) in results:
+                    # Each process has its own copy of the context
+                    for committer in repo_changes.committers.values():
+                        if "committer" not in committer:
+                            committer["color"] = self.context.colors.get_new_color()
+
+                    self.context.filters.merge(filters)
+                    self.__add_repository__(repo_changes, repo_blames, repo_metrics)
+        else:
+            for repo in self.repos:
+                self.__add_repository__(*__load_repository__(repo, self.config,
+                                                             self.context)[0:3])
 
-            if self.config.metrics:
-                self.metrics += MetricsLogic()
+    def __add_repository__(self, repo_changes, repo_blames, repo_metrics):
+        """
+        Add the changes, the blames and the metrics of a repository to
+        the ones of the run.
+        """
+        self.blames += repo_blames
+        self.changes += repo_changes
 
-            if self.config.progress and sys.stdout.isatty() and format.is_interactive_format():
-                terminal.clear_row()
+        if self.config.metrics:
+            self.metrics += repo_metrics
 
-        os.chdir(previous_directory)
+        if self.config.progress and sys.stdout.isatty() and self.context.is_interactive_format():
+            terminal.clear_row()
 
     def __output__(self):
         """
@@ -168,6 +198,34 @@ class Runner(object):
         self.__output__()
 
 
+def __load_repository__(repo, config, context):
+    """
+    Compute the changes, the blames and possibly the metrics of a
+    repository, and return them along with the filters of the context,
+    which hold the strings they matched.
+    """
+    # Initialize the branches
+    if config.branch == "--all":
+        config.branches = repo.branches if repo.branches is not None \
+            else local_branches(repo.location)
+
+    # The baseline is resolved in the repository, the caches being
+    # keyed by its SHA
+    if config.baseline:
+        baseline = git_utils.rev_parse(repo.location, config.baseline)
+        if baseline is None:
+            warning(_("{0}: the baseline {1} is missing, and therefore not ignored").\
+                    format(repo.name, config.baseline))
+        config = copy.copy(config)
+        config.baseline = baseline
+
+    repo_changes = Changes(repo, config, context)
+    repo_blames = Blame(repo, repo_changes, config, context)
+    repo_metrics = MetricsLogic(repo, context) if config.metrics else None
+
+    return (repo_changes, repo_blames, repo_metrics, context.filters)
+
+
 def __check_python_version__():
     """
     Check for a sufficiently recent python version.
@@ -177,6 +235,31 @@ def __check_python_version__():
         error(_("gitinspector requires Python >=3.6 (version {0} was found).").format(python_version))
 
 
+def __get_baseline__(config, repos=None):
+    """
+    Returns the revision of the baseline of the configuration. A
+    baseline that is a revision of one of the repositories `repos` is
+    kept as is. Otherwise, a baseline given as the address or the path
+    of a repository is resolved once into the SHA of its HEAD, which is
+    then looked for in every repository. When the repositories are not
+    known yet, only the addresses are resolved.
+    """
+    baseline = config.baseline
+    if not baseline or (repos and any(git_utils.rev_parse(r.location, baseline) for r in repos)):
+        return baseline
+
+    if urlparse(baseline).scheme:
+        baseline = git_utils.remote_head(baseline)
+    elif repos is not None and os.path.isdir(baseline):
+        baseline = git_utils.rev_parse(baseline, "HEAD")
+    else:
+        return baseline
+
+    if baseline is None:
+        error(_("{0}: unable to resolve the baseline").format(config.baseline))
+    return baseline
+
+
 def __get_validated_git_repos__(config):
     """
     Returns a list of Repository objects that have been newly cloned
@@ -192,7 +275,8 @@ def __get_validated_git_repos__(config):
         cloned_repo = Repository.create(repo, config)
 
         if cloned_repo.name is None:
-            cloned_repo.location = basedir.get_basedir_git(cloned_repo.location)
+            (cloned_repo.location, cloned_repo.branches) = \
+                basedir.get_git_facts(cloned_repo.location)
             cloned_repo.name = os.path.basename(cloned_repo.location)
 
         repos.append(cloned_repo)
@@ -200,7 +284,21 @@ def __get_validated_git_repos__(config):
     return repos
 
 
-def __parse_arguments__(args=None):
+def __positive_int__(string):
+    """
+    The type of the options that are positive integers, any other value
+    being reported as an error.
+    """
+    try:
+        value = int(string)
+    except ValueError:
+        value = 0
+    if value < 1:
+        error(_("{0}: the value must be a positive integer").format(string))
+    return value
+
+
+def __parse_arguments__(args=None, namespace=None):
     parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
                                      allow_abbrev=False, description=
         _("List information about the repository in REPOSITORY. If no repository is \n"
@@ -221,6 +319,31 @@ def __parse_arguments__(args=None):
     parser.add_argument('-b', '--branch', metavar='BRANCH', help=
                         _("the name of the branch for git to checkout, the default "
                           "being 'master'"), default="--all")
+    parser.add_argument('--baseline', metavar='BASELINE', help=
+                        _("ignore the commits and the rows coming from a baseline, for example "
+                          "the template the repositories have been forked from, given either "
+                          "as a revision or as the address of a repository whose HEAD is taken"),
+                        default=None)
+    parser.add_argument('--batch', metavar='MANIFEST', help=
+                        _("analyze the repositories listed in the given manifest, one run per "
+                          "line given as the repositories and the options of the run, which "
+                          "must include the output file; the runs take place in --jobs "
+                          "processes, the other options being the default options of the "
+                          "runs, and the given --output receives the summary of the runs"))
+    parser.add_argument('--blame-all-files', action='store_true', help=
+                        _("with --since or --until, also blame the files that were not "
+                          "modified inside the interval, instead of leaving them out"))
+    parser.add_argument('--blame-backend', metavar='BACKEND', help=
+                        _("run the workers blaming the files either as 'threads' or as "
+                          "'processes'; processes are faster on big files, since the "
+                          "parsing of the blames is not limited to a single processor"),
+                        default="threads", choices=["threads", "processes"])
+    parser.add_argument('--cache-dir', metavar='DIR', help=
+                        _("keep the commits and the blames read from git in the given "
+                          "directory, so that the next runs only read the commits that are "
+                          "new and only blame the files that changed; the cached data is "
+                          "loaded with pickle, so the directory must only be writable by "
+                          "the current user"))
     parser.add_argument('-d', '--debug-mode', action='store_true', help=
                         _("displays some debug messages"))
     parser.add_argument('-f', '--file-types', metavar='TYPES', help=
@@ -241,6 +364,10 @@ def __parse_arguments__(args=None):
     parser.add_argument('-H', '--hard', action='store_true', help=
                         _("track rows and look for duplicates harder;"
                           "this can be quite slow with big repositories"))
+    parser.add_argument('-j', '--jobs', metavar='N', type=__positive_int__, help=
+                        _("the number of files that are blamed at the same time, "
+                          "the default being the number of processors"),
+                        default=multiprocessing.cpu_count())
     parser.add_argument('-l', '--list-file-types', action='store_true', help=
                         _("list all the file extensions available in the current branch "
                           "of the repository"))
@@ -251,6 +378,11 @@ def __parse_arguments__(args=None):
                         _("include checks for certain metrics during the analysis of commits"))
     parser.add_argument('-o', '--output', metavar='FILE', help=
                         _("output the statistics in the given file"))
+    parser.add_argument('--pathspecs', action='store_true', help=
+                        _("let git leave out the files that do not match the file types or "
+                          "that are excluded by a plain file pattern, which is faster on big "
+                          "repositories; the commits only changing such files are then not "
+                          "counted, and these files are not listed as other files"))
     parser.add_argument('-r', '--responsibilities', action='store_true', help=
                         _("show which files the different authors seem most responsible for"))
     parser.add_argument('-s', '--since', metavar='DATE',
@@ -281,7 +413,7 @@ def __parse_arguments__(args=None):
     parser.add_argument('-z', '--legacy', action='store_true', help=
                         _("display the legacy outputs for additional information (may be buggy)"))
 
-    options, unknown = parser.parse_known_args() if args is None else parser.parse_known_args(args)
+    options, unknown = parser.parse_known_args(args, namespace)
     if (unknown):
         error("%s: Unknown option" % unknown[0])
 
@@ -310,6 +442,9 @@ def main():
             version.output()
             sys.exit(0)
 
+        if options.batch:
+            sys.exit(batch.run(options))
+
         if options.output is None:
             writer = StdoutWriter()
         else:
@@ -21,16 +21,14 @@ import hashlib
 
 from urllib.parse import urlencode
 
-from . import format
-
-def get_url(email, size=20):
+def get_url(email, selected_format, size=20):
     md5hash = hashlib.md5(email.encode("utf-8").lower().strip()).hexdigest()
     base_url = "https://www.gravatar.com/avatar/" + md5hash
     params = {}
 
-    if format.get_selected() == "html":
+    if selected_format == "html":
         params = {"default": "identicon", "size": size}
-    elif format.get_selected() == "xml" or format.get_selected() == "json":
+    elif selected_format == "xml" or selected_format == "json":
         params = {"default": "identicon"}
 
     return base_url + "?" + urlencode(params)
@@ -19,50 +19,38 @@
 
 from shlex import quote
 
-__since__ = ""
-__until__ = ""
-__ref__ = "HEAD"
 
-# TODO: We definitely need to rewrite the 'interval' module to be part
-# of the Runner context and NOT BEING GLOBAL! (for our own sake!)...
+class Interval(object):
+    """
+    The bounds on the dates of the commits of a run, given as options
+    to git, along with the reference of the last analyzed commit.
+    """
+    def __init__(self):
+        self.__since__ = ""
+        self.__until__ = ""
+        self.__ref__ = "HEAD"
 
+    def has_interval(self):
+        return self.__since__ + self.__until__ != ""
 
-def has_interval():
-    global __since__, __until__
-    return __since__ + __until__ != ""
+    def get_since(self):
+        return self.__since__
 
+    def set_since(self, since):
+        self.__since__ = "--since=" + quote(since)
 
-def get_since():
-    global __since__
-    return __since__
+    def get_until(self):
+        return self.__until__
 
+    def set_until(self, until):
+        self.__until__ = "--until=" + quote(until)
 
-def set_since(since):
-    global __since__
-    __since__ = "--since=" + quote(since)
+    def get_ref(self):
+        return self.__ref__
 
+    def set_ref(self, ref):
+        self.__ref__ = ref
 
-def get_until():
-    global __until__
-    return __until__
-
-
-def set_until(until):
-    global __until__
-    __until__ = "--until=" + quote(until)
-
-
-def get_ref():
-    global __ref__
-    return __ref__
-
-
-def set_ref(ref):
-    global __ref__
-    __ref__ = ref
-
-
-def clear():
-    global __since__, __until__
-    __since__ = ""
-    __until__ = ""
+    def clear(self):
+        self.__since__ = ""
+        self.__until__ = ""
@@ -17,10 +17,11 @@
 # You should have received a copy of the GNU General Public License
 # along with gitinspector. If not, see <http://www.gnu.org/licenses/>.
 
+import io
 import re
 import subprocess
 from .changes import FileDiff
-from . import comment, filtering, interval
+from . import comment, git_utils
 
 __metric_eloc__ = {
     "java": 500, "c": 500, "cpp": 500, "cs": 500,
@@ -55,44 +56,41 @@ class MetricsLogic(object):
         metrics.cyclomatic_complexity_density = {}
         return metrics
 
-    def __init__(self):
+    def __init__(self, repo, context):
         self.eloc = {}
         self.cyclomatic_complexity = {}
         self.cyclomatic_complexity_density = {}
 
-        ls_tree_p = subprocess.Popen(["git", "ls-tree", "--name-only", "-r",
-                                      interval.get_ref()], bufsize=1,
+        ls_tree_p = subprocess.Popen(git_utils.__git__(repo.location) + ["ls-tree", "--name-only", "-r",
+                                                                          context.interval.get_ref()], bufsize=1,
                                      stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
         lines = ls_tree_p.communicate()[0].splitlines()
         ls_tree_p.wait()
         ls_tree_p.stdout.close()
 
         if ls_tree_p.returncode == 0:
-            for i in lines:
-                i = i.strip().decode("unicode_escape", "ignore")
-                i = i.encode("latin-1", "replace")
-                i = i.decode("utf-8", "replace").strip("\"").strip("'").strip()
-
-                if filtering.is_acceptable_file_name(FileDiff.get_filename(i)):
-                    file_cmd = subprocess.Popen(["git", "show",
-                                                 interval.get_ref() + ":{0}".format(i.strip())],
-                                                bufsize=1, stdout=subprocess.PIPE)
-                    file_r = file_cmd.stdout.readlines()
-                    file_cmd.wait()
-                    file_cmd.stdout.close()
-
-                    extension = FileDiff.get_extension(i)
-                    lines = MetricsLogic.get_eloc(file_r, extension)
-                    cycc = MetricsLogic.get_cyclomatic_complexity(file_r, extension)
-
-                    if __metric_eloc__.get(extension, None) is not None and __metric_eloc__[extension] < lines:
-                        self.eloc[i.strip()] = lines
-
-                    if METRIC_CYCLOMATIC_COMPLEXITY_THRESHOLD < cycc:
-                        self.cyclomatic_complexity[i.strip()] = cycc
-
-                    if lines > 0 and METRIC_CYCLOMATIC_COMPLEXITY_DENSITY_THRESHOLD < cycc / float(lines):
-                        self.cyclomatic_complexity_density[i.strip()] = cycc / float(lines)
+            with git_utils.BlobReader(repo.location) as reader:
+                for i in lines:
+                    i = i.strip().decode("unicode_escape", "ignore")
+                    i = i.encode("latin-1", "replace")
+                    i = i.decode("utf-8", "replace").strip("\"").strip("'").strip()
+
+                    if context.filters.is_acceptable_file_name(i):
+                        file_r = reader.read(context.interval.get_ref() + ":{0}".format(i.strip()))
+                        file_r = io.BytesIO(file_r or b"").readlines()
+
+                        extension = FileDiff.get_extension(i)
+                        lines = MetricsLogic.get_eloc(file_r, extension)
+                        cycc = MetricsLogic.get_cyclomatic_complexity(file_r, extension)
+
+                        if __metric_eloc__.get(extension, None) is not None and __metric_eloc__[extension] < lines:
+                            self.eloc[i.strip()] = lines
+
+                        if METRIC_CYCLOMATIC_COMPLEXITY_THRESHOLD < cycc:
+                            self.cyclomatic_complexity[i.strip()] = cycc
+
+                        if lines > 0 and METRIC_CYCLOMATIC_COMPLEXITY_DENSITY_THRESHOLD < cycc / float(lines):
+                            self.cyclomatic_complexity_density[i.strip()] = cycc / float(lines)
 
     def __iadd__(self, other):
         try:
@@ -23,7 +23,7 @@ import string
 import sys
 import textwrap
 
-from .. import format, gravatar, terminal
+from .. import gravatar, terminal
 from ..blame import Blame
 from .outputable import Outputable
 
@@ -34,10 +34,10 @@ class BlameOutput(Outputable):
     output_order = 200
 
     def __init__(self, runner):
-        if runner.config.progress and format.is_interactive_format():
+        if runner.config.progress and runner.context.is_interactive_format():
             print("")
 
-        Outputable.__init__(self)
+        Outputable.__init__(self, runner)
         self.changes = runner.changes
         self.blames = runner.blames
         self.display = bool(self.changes.all_commits())
@@ -67,7 +67,7 @@ class BlameOutput(Outputable):
                                                 for k,v in author_blames.items()}))
 
             data_array.append({
-                "avatar": "<img src=\"{0}\" title=\"{1}\"/>".format(gravatar.get_url(email), email),
+                "avatar": "<img src=\"{0}\" title=\"{1}\"/>".format(gravatar.get_url(email, self.context.format), email),
                 "color": self.changes.committers[entry[0]]["color"],
                 "name":  name,
                 "rows": entry[1].rows,
@@ -95,7 +95,7 @@ class BlameOutput(Outputable):
 
             name_json = "\t\t\t\t\"name\": \"" + author_name + "\",\n"
             email_json = "\t\t\t\t\"email\": \"" + author_email + "\",\n"
-            gravatar_json = "\t\t\t\t\"gravatar\": \"" + gravatar.get_url(author_email) + "\",\n"
+            gravatar_json = "\t\t\t\t\"gravatar\": \"" + gravatar.get_url(author_email, self.context.format) + "\",\n"
             rows_json = "\t\t\t\t\"rows\": " + str(i[1].rows) + ",\n"
             stability_json = ("\t\t\t\t\"stability\": " + "{0:.1f}".format(Blame.get_stability(i[0], i[1].rows,
                                                                                                self.changes)) + ",\n")
@@ -110,7 +110,7 @@ class BlameOutput(Outputable):
         self.out.write(",\n\t\t\"blame\": {\n" + message_json + "\t\t\t\"authors\": [\n\t\t\t" + blame_json + "]\n\t\t}")
 
     def output_text(self):
-        if self.progress and sys.stdout.isatty() and format.is_interactive_format():
+        if self.progress and sys.stdout.isatty() and self.context.is_interactive_format():
             terminal.clear_row()
 
         self.out.writeln(textwrap.fill(BLAME_INFO_TEXT() + ":", width=terminal.get_size()[0]) + "\n")
@@ -136,7 +136,7 @@ class BlameOutput(Outputable):
 
             name_xml = "\t\t\t\t<name>" + author_name + "</name>\n"
             email_xml = "\t\t\t\t<email>" + author_email + "</email>\n"
-            gravatar_xml = "\t\t\t\t<gravatar>" + gravatar.get_url(author_email) + "</gravatar>\n"
+            gravatar_xml = "\t\t\t\t<gravatar>" + gravatar.get_url(author_email, self.context.format) + "</gravatar>\n"
             rows_xml = "\t\t\t\t<rows>" + str(i[1].rows) + "</rows>\n"
             stability_xml = ("\t\t\t\t<stability>" + "{0:.1f}".format(Blame.get_stability(author_name, i[1].rows,
                                                                                           self.changes)) + "</stability>\n")
@@ -33,7 +33,7 @@ class ChangesOutput(Outputable):
     output_order = 100
 
     def __init__(self, runner):
-        Outputable.__init__(self)
+        Outputable.__init__(self, runner)
         self.changes = runner.changes
         self.display = True
         self.out = runner.out
@@ -66,19 +66,20 @@ class ChangesOutput(Outputable):
                     authortypes[t] = 0
             othertypes = len(self.changes.filtered_files(committer))
             max_other = max(max_other, othertypes)
-            authorinfo.types = "<svg class='changes_svg_types'>{0}</svg>".format(\
+            # The AuthorInfos are shared with the other outputs
+            svg_types = "<svg class='changes_svg_types'>{0}</svg>".format(\
                                     json.dumps({ "relevant" : authortypes,
                                                  "other" :  othertypes }))
 
             data_array.append({
                 "avatar": "<img src=\"{0}\" title=\"{1}\"/>".format(
-                    gravatar.get_url(committer[1]), committer[1]),
+                    gravatar.get_url(committer[1], self.context.format), committer[1]),
                 "color": self.changes.committers[committer]["color"],
                 "name": committer[0],
                 "commits" : authorinfo.commits,
                 "insertions" : authorinfo.insertions,
                 "deletions" : authorinfo.deletions,
-                "types" : authorinfo.types,
+                "types" : svg_types,
                 "changes" : round(percentage,2),
                 })
 
@@ -112,7 +113,7 @@ class ChangesOutput(Outputable):
                 changes_json += "{\n"
                 changes_json += "\t\t\t\t\"name\": \"" + author_name + "\",\n"
                 changes_json += "\t\t\t\t\"email\": \"" + author_email + "\",\n"
-                changes_json += "\t\t\t\t\"gravatar\": \"" + gravatar.get_url(author_email) + "\",\n"
+                changes_json += "\t\t\t\t\"gravatar\": \"" + gravatar.get_url(author_email, self.context.format) + "\",\n"
                 changes_json += "\t\t\t\t\"commits\": " + str(authorinfo.commits) + ",\n"
                 changes_json += "\t\t\t\t\"insertions\": " + str(authorinfo.insertions) + ",\n"
                 changes_json += "\t\t\t\t\"deletions\": " + str(authorinfo.deletions) + ",\n"
@@ -176,7 +177,7 @@ class ChangesOutput(Outputable):
                 changes_xml += "\t\t\t<author>\n"
                 changes_xml += "\t\t\t\t<name>" + author_name + "</name>\n"
                 changes_xml += "\t\t\t\t<email>" + author_email + "</email>\n"
-                changes_xml += "\t\t\t\t<gravatar>" + gravatar.get_url(author_email) + "</gravatar>\n"
+                changes_xml += "\t\t\t\t<gravatar>" + gravatar.get_url(author_email, self.context.format) + "</gravatar>\n"
                 changes_xml += "\t\t\t\t<commits>" + str(authorinfo.commits) + "</commits>\n"
                 changes_xml += "\t\t\t\t<insertions>" + str(authorinfo.insertions) + "</insertions>\n"
                 changes_xml += "\t\t\t\t<deletions>" + str(authorinfo.deletions) + "</deletions>\n"
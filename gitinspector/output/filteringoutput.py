@@ -22,7 +22,7 @@ import string
 import textwrap
 
 from ..changes import FileType
-from ..filtering import get_filtered, has_filtered, Filters
+from ..filtering import Filters
 from .outputable import Outputable
 from .. import terminal
 
@@ -37,7 +37,7 @@ class FilteringOutput(Outputable):
     output_order = 600
 
     def __init__(self, runner):
-        Outputable.__init__(self)
+        Outputable.__init__(self, runner)
         self.display = bool(runner.changes.all_commits())
         self.changes = runner.changes
         self.out = runner.out
@@ -55,10 +55,11 @@ class FilteringOutput(Outputable):
         return filtering_xml
 
     def output_html(self):
+        filters = self.context.filters
         authorinfo_dict = self.changes.get_authorinfo_list()
         filtered_files = {k:self.changes.filtered_files(k) for k in authorinfo_dict}
         filtered_sizes = [len(s) for s in filtered_files.values()]
-        if has_filtered() or any(filtered_sizes):
+        if filters.has_filtered() or any(filtered_sizes):
             other_files = "<table class='git2'>"
             par = "even"
             for committer, files in filtered_files.items():
@@ -82,13 +83,13 @@ class FilteringOutput(Outputable):
                 self.out.write(src.substitute(
                     other_files=other_files,
                     files_filtering_text=FILTERING_FILE_INFO_TEXT(),
-                    files_filtered=", ".join(get_filtered(Filters.FILE_OUT)),
+                    files_filtered=", ".join(filters.get_filtered(Filters.FILE_OUT)),
                     authors_filtering_text=FILTERING_AUTHOR_INFO_TEXT(),
-                    authors_filtered=", ".join(get_filtered(Filters.AUTHOR)),
+                    authors_filtered=", ".join(filters.get_filtered(Filters.AUTHOR)),
                     emails_filtering_text=FILTERING_EMAIL_INFO_TEXT(),
-                    emails_filtered=", ".join(get_filtered(Filters.EMAIL)),
+                    emails_filtered=", ".join(filters.get_filtered(Filters.EMAIL)),
                     commits_filtering_text=FILTERING_COMMIT_INFO_TEXT(),
-                    commits_filtered=", ".join(get_filtered(Filters.REVISION)),
+                    commits_filtered=", ".join(filters.get_filtered(Filters.REVISION)),
                 ))
 
     @staticmethod
@@ -108,16 +109,17 @@ class FilteringOutput(Outputable):
         return ""
 
     def output_json(self):
-        if has_filtered():
+        filters = self.context.filters
+        if filters.has_filtered():
             output = ",\n\t\t\"filtering\": {"
             output += FilteringOutput.__output_json_section__(FILTERING_FILE_INFO_TEXT(),
-                                                              get_filtered(Filters.FILE_OUT), "files")
+                                                              filters.get_filtered(Filters.FILE_OUT), "files")
             output += FilteringOutput.__output_json_section__(FILTERING_AUTHOR_INFO_TEXT(),
-                                                              get_filtered(Filters.AUTHOR), "authors")
+                                                              filters.get_filtered(Filters.AUTHOR), "authors")
             output += FilteringOutput.__output_json_section__(FILTERING_EMAIL_INFO_TEXT(),
-                                                              get_filtered(Filters.EMAIL), "emails")
+                                                              filters.get_filtered(Filters.EMAIL), "emails")
             output += FilteringOutput.__output_json_section__(FILTERING_COMMIT_INFO_TEXT(),
-                                                              get_filtered(Filters.REVISION), "revision")
+                                                              filters.get_filtered(Filters.REVISION), "revision")
             output = output[:-1]
             output += "\n\t\t}"
             self.out.write(output)
@@ -131,10 +133,11 @@ class FilteringOutput(Outputable):
                 self.out.writeln("...%s" % i[-width+3:] if len(i) > width else i)
 
     def output_text(self):
-        self.__output_text_section__(FILTERING_FILE_INFO_TEXT(), get_filtered(Filters.FILE_OUT))
-        self.__output_text_section__(FILTERING_AUTHOR_INFO_TEXT(), get_filtered(Filters.AUTHOR))
-        self.__output_text_section__(FILTERING_EMAIL_INFO_TEXT(), get_filtered(Filters.EMAIL))
-        self.__output_text_section__(FILTERING_COMMIT_INFO_TEXT(), get_filtered(Filters.REVISION))
+        filters = self.context.filters
+        self.__output_text_section__(FILTERING_FILE_INFO_TEXT(), filters.get_filtered(Filters.FILE_OUT))
+        self.__output_text_section__(FILTERING_AUTHOR_INFO_TEXT(), filters.get_filtered(Filters.AUTHOR))
+        self.__output_text_section__(FILTERING_EMAIL_INFO_TEXT(), filters.get_filtered(Filters.EMAIL))
+        self.__output_text_section__(FILTERING_COMMIT_INFO_TEXT(), filters.get_filtered(Filters.REVISION))
 
     def __output_xml_section__(self, info_string, filtered, container_tagname):
         if filtered:
@@ -149,14 +152,15 @@ class FilteringOutput(Outputable):
             self.out.writeln("\t\t</{0}>".format(container_tagname))
 
     def output_xml(self):
-        if has_filtered():
+        filters = self.context.filters
+        if filters.has_filtered():
             self.out.writeln("\t<filtering>")
             self.__output_xml_section__(FILTERING_FILE_INFO_TEXT(),
-                                        get_filtered(Filters.FILE_OUT), "files")
+                                        filters.get_filtered(Filters.FILE_OUT), "files")
             self.__output_xml_section__(FILTERING_AUTHOR_INFO_TEXT(),
-                                        get_filtered(Filters.AUTHOR), "authors")
+                                        filters.get_filtered(Filters.AUTHOR), "authors")
             self.__output_xml_section__(FILTERING_EMAIL_INFO_TEXT(),
-                                        get_filtered(Filters.EMAIL), "emails")
+                                        filters.get_filtered(Filters.EMAIL), "emails")
             self.__output_xml_section__(FILTERING_COMMIT_INFO_TEXT(),
-                                        get_filtered(Filters.REVISION), "revision")
+                                        filters.get_filtered(Filters.REVISION), "revision")
             self.out.writeln("\t</filtering>")
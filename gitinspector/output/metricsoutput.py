@@ -44,7 +44,7 @@ class MetricsOutput(Outputable):
     output_order = 400
 
     def __init__(self, runner):
-        Outputable.__init__(self)
+        Outputable.__init__(self, runner)
         self.metrics = runner.metrics
         self.display = bool(runner.changes.all_commits()) and bool(runner.config.metrics)
         self.out = runner.out
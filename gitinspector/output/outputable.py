@@ -20,13 +20,13 @@
 import glob
 import importlib
 import os
-from .. import format
 
 
 class Outputable(object):
     outputables = [] # Children classes
 
-    def __init__(self):
+    def __init__(self, runner):
+        self.context = runner.context
         self.display = False
 
     def __init_subclass__(cls, **kwargs):
@@ -58,11 +58,11 @@ class Outputable(object):
 
     def output(self):
         if self.display:
-            if format.get_selected() == "html" or format.get_selected() == "htmlembedded":
+            if self.context.format == "html" or self.context.format == "htmlembedded":
                 self.output_html()
-            elif format.get_selected() == "json":
+            elif self.context.format == "json":
                 self.output_json()
-            elif format.get_selected() == "text":
+            elif self.context.format == "text":
                 self.output_text()
             else:
                 self.output_xml()
@@ -40,7 +40,7 @@ class OwnershipOutput(Outputable):
     output_order = 120
 
     def __init__(self, runner):
-        Outputable.__init__(self)
+        Outputable.__init__(self, runner)
         self.changes = runner.changes
         self.blames = runner.blames
         self.weeks = runner.config.weeks
@@ -33,7 +33,7 @@ class ResponsibilitiesOutput(Outputable):
     output_order = 500
 
     def __init__(self, runner):
-        Outputable.__init__(self)
+        Outputable.__init__(self, runner)
         self.changes = runner.changes
         self.blame = runner.blames
         self.display = bool(runner.changes.all_commits()) and bool(runner.config.responsibilities)
@@ -114,7 +114,7 @@ class ResponsibilitiesOutput(Outputable):
                 resp_json += "{\n"
                 resp_json += "\t\t\t\t\"name\": \"" + author_name + "\",\n"
                 resp_json += "\t\t\t\t\"email\": \"" + author_email + "\",\n"
-                resp_json += "\t\t\t\t\"gravatar\": \"" + gravatar.get_url(author_email) + "\",\n"
+                resp_json += "\t\t\t\t\"gravatar\": \"" + gravatar.get_url(author_email, self.context.format) + "\",\n"
                 resp_json += "\t\t\t\t\"files\": [\n\t\t\t\t"
 
                 for j, entry in enumerate(responsibilities):
@@ -146,7 +146,7 @@ class ResponsibilitiesOutput(Outputable):
                 resp_xml += "\t\t\t<author>\n"
                 resp_xml += "\t\t\t\t<name>" + author_name + "</name>\n"
                 resp_xml += "\t\t\t\t<email>" + author_email + "</email>\n"
-                resp_xml += "\t\t\t\t<gravatar>" + gravatar.get_url(author_email) + "</gravatar>\n"
+                resp_xml += "\t\t\t\t<gravatar>" + gravatar.get_url(author_email, self.context.format) + "</gravatar>\n"
                 resp_xml += "\t\t\t\t<files>\n"
 
                 for j, entry in enumerate(responsibilities):
@@ -21,7 +21,7 @@ import os
 import string
 import textwrap
 
-from .. import format, gravatar, terminal, timeline
+from .. import gravatar, terminal, timeline
 from .outputable import Outputable
 
 MODIFIED_ROWS_TEXT = lambda: _("Modified Rows:")
@@ -32,7 +32,7 @@ class TimelineOutput(Outputable):
     output_order = 300
 
     def __init__(self, runner):
-        Outputable.__init__(self)
+        Outputable.__init__(self, runner)
         self.changes = runner.changes
         self.useweeks = runner.config.weeks
         self.display = bool(runner.changes.all_commits()) and \
@@ -102,7 +102,7 @@ class TimelineOutput(Outputable):
 
                         authors_json += "{\n\t\t\t\t\t\"name\": \"" + name[0] + "\",\n"
                         authors_json += "\t\t\t\t\t\"email\": \"" + name[1] + "\",\n"
-                        authors_json += "\t\t\t\t\t\"gravatar\": \"" + gravatar.get_url(name[1]) + "\",\n"
+                        authors_json += "\t\t\t\t\t\"gravatar\": \"" + gravatar.get_url(name[1], self.context.format) + "\",\n"
                         authors_json += "\t\t\t\t\t\"work\": \"" + signs_str + "\"\n\t\t\t\t},"
                 # Removing the last trailing ','
                 authors_json = authors_json[:-1]
@@ -141,7 +141,7 @@ class TimelineOutput(Outputable):
 
                         authors_xml += "\t\t\t\t\t<author>\n\t\t\t\t\t\t<name>" + name[0] + "</name>\n"
                         authors_xml += "\t\t\t\t\t\t<email>" + name[1] + "</email>\n"
-                        authors_xml += "\t\t\t\t\t\t<gravatar>" + gravatar.get_url(name[1]) + "</gravatar>\n"
+                        authors_xml += "\t\t\t\t\t\t<gravatar>" + gravatar.get_url(name[1], self.context.format) + "</gravatar>\n"
                         authors_xml += "\t\t\t\t\t\t<work>" + signs_str + "</work>\n\t\t\t\t\t</author>\n"
 
                 authors_xml += "\t\t\t\t</authors>\n"
@@ -197,8 +197,9 @@ class TimelineOutput(Outputable):
             if timeline_data.is_author_in_periods(periods, name[0]):
                 timeline_xml += "<tr" + (" class=\"odd\">" if i % 2 == 1 else ">")
 
-                if format.get_selected() == "html":
-                    timeline_xml += "<td class=\"type-user\"><img src=\"{0}\"/>{1}</td>".format(gravatar.get_url(name[1]), name[0])
+                if self.context.format == "html":
+                    timeline_xml += "<td class=\"type-user\"><img src=\"{0}\"/>{1}</td>".format(
+                        gravatar.get_url(name[1], self.context.format), name[0])
                 else:
                     timeline_xml += "<td class=\"type-user\">" + name[0] + "</td>"
 
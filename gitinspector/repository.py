@@ -24,6 +24,7 @@ import sys
 import tempfile
 
 from urllib.parse import urlparse
+from . import git_utils
 from .messages import error, warning, debug
 
 class Repository(object):
@@ -33,6 +34,7 @@ class Repository(object):
         self.name = name
         self.location = location
         self.config = config
+        self.branches = None # The local branches, when they are known
 
     @classmethod
     def create(cls, url, config):
@@ -61,8 +63,8 @@ class Repository(object):
             shutil.rmtree(path, ignore_errors=True)
 
     def authors(self):
-        authors_cmd = subprocess.Popen(["git", "-C", self.location, "shortlog",
-                                        "-esn", self.config.branch],
+        authors_cmd = subprocess.Popen(git_utils.__git__(self.location) + ["shortlog", "-esn",
+                                                                           self.config.branch],
                                        bufsize=1, stdout=subprocess.PIPE)
         rows = authors_cmd.stdout.readlines()
         authors_cmd.wait()
@@ -19,6 +19,8 @@
 
 import datetime
 
+from .changes import AuthorInfo
+
 
 class TimelineData(object):
     def __init__(self, changes, useweeks):
@@ -37,23 +39,21 @@ class TimelineData(object):
             else:
                 key = (i[0][1], i[0][0][0:7])
 
+            # The AuthorInfos of the changes are shared, and are not modified
             if self.entries.get(key, None) is None:
-                self.entries[key] = i[1]
-            else:
-                self.entries[key].insertions += i[1].insertions
-                self.entries[key].deletions += i[1].deletions
-                self.entries[key].commits += i[1].commits
-
-        for period in self.get_periods():
-            total_insertions = 0
-            total_deletions = 0
-
-            for author in self.get_committers():
-                entry = self.entries.get((author, period), None)
-                if entry is not None:
-                    total_insertions += entry.insertions
-                    total_deletions += entry.deletions
-
+                self.entries[key] = AuthorInfo()
+            self.entries[key].insertions += i[1].insertions
+            self.entries[key].deletions += i[1].deletions
+            self.entries[key].commits += i[1].commits
+
+        # The totals of the periods are summed in a single pass over the entries
+        totals = {}
+        for ((author, period), entry) in self.entries.items():
+            (total_insertions, total_deletions) = totals.get(period, (0, 0))
+            totals[period] = (total_insertions + entry.insertions,
+                              total_deletions + entry.deletions)
+
+        for (period, (total_insertions, total_deletions)) in totals.items():
             self.total_changes_by_period[period] = (total_insertions, total_deletions,
                                                     total_insertions + total_deletions)
 
@@ -122,6 +122,7 @@ setup(
         packages = find_packages(exclude = ['tests']),
         package_data = {"": ["html/*", "translations/*"]},
         data_files = [("share/doc/gitinspector", glob("*.txt"))],
+        extras_require = {"numpy": ["numpy"]},
         entry_points = {"console_scripts": ["gitinspector = gitinspector.gitinspector:main"]},
         zip_safe = False,
         cmdclass = {
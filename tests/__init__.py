@@ -17,4 +17,17 @@
 # You should have received a copy of the GNU General Public License
 # along with gitinspector. If not, see <http://www.gnu.org/licenses/>.
 
-# This file was intentionally left blank.
+import os
+import time
+
+
+def set_timezone(timezone):
+    """Sets the timezone of the process and of git, returning the
+    previous one, so that a test can restore it with addCleanup."""
+    previous = os.environ.get("TZ", None)
+    if timezone is None:
+        os.environ.pop("TZ", None)
+    else:
+        os.environ["TZ"] = timezone
+    time.tzset()
+    return previous
@@ -17,6 +17,7 @@
 
 import os
 import shutil
+import subprocess
 import tempfile
 import unittest
 import zipfile
@@ -80,6 +81,83 @@ class BasicRepositoryTest(unittest.TestCase):
         # Check the metrics
         self.assertEqual(r.metrics.eloc, {}) # Both files are too short, no metrics to report
 
+    def __check_baseline__(self, baseline):
+        opts = __parse_arguments__(args=['--branch', 'master',
+                                         '--file-types', '*.c,*.txt,Makefile',
+                                         '--baseline', baseline,
+                                         '--silent',
+                                         'build/tests/basic-repository'])
+        opts.progress = False
+
+        r = Runner(opts, None)
+        r.process()
+
+        # Only the last commit and its rows are counted
+        self.assertEqual(len(r.changes.all_commits()), 1)
+        blames = r.blames.all_blames()
+        self.assertEqual(list(blames.keys()), [(('Andrew Johnson', 'jojo@gov.us'), 'Makefile')])
+        self.assertEqual(blames[(('Andrew Johnson', 'jojo@gov.us'), 'Makefile')].rows, 10)
+
+    def test_baseline(self):
+        self.__check_baseline__('master~1')
+
+    def test_baseline_template(self):
+        # The template is the master branch without its last commit
+        template = "build/tests/template-repository"
+        subprocess.check_call(["git", "clone", "-q", "build/tests/basic-repository", template])
+        self.addCleanup(shutil.rmtree, template)
+        subprocess.check_call(["git", "-C", template, "reset", "-q", "--hard", "origin/master~1"])
+
+        # The template is given by its path, or by its address
+        self.__check_baseline__(template)
+        self.__check_baseline__("file://" + os.path.abspath(template))
+
+        # A revision is not taken for a directory of the same name
+        os.makedirs("build/tests/master~1")
+        self.addCleanup(os.rmdir, "build/tests/master~1")
+        cwd = os.getcwd()
+        os.chdir("build/tests")
+        try:
+            opts = __parse_arguments__(args=['--branch', 'master', '--baseline', 'master~1',
+                                             '--silent', 'basic-repository'])
+            opts.progress = False
+            r = Runner(opts, None)
+            r.process()
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(len(r.changes.all_commits()), 1)
+
+    def test_baseline_root(self):
+        # A repository starting with its own root commit, into which the
+        # template is merged
+        student = "build/tests/student-repository"
+        subprocess.check_call(["git", "init", "-q", student])
+        self.addCleanup(shutil.rmtree, student)
+        with open(os.path.join(student, "student.txt"), "w") as f:
+            f.write("Not all those who wander\nare lost\n")
+        git = ["git", "-C", student, "-c", "user.name=Frodo Baggins",
+               "-c", "user.email=frodo@shire.net"]
+        subprocess.check_call(git + ["add", "student.txt"])
+        subprocess.check_call(git + ["commit", "-q", "-m", "Add student.txt"])
+        subprocess.check_call(git + ["fetch", "-q", os.path.abspath("build/tests/basic-repository"),
+                                     "master:tpl"])
+        subprocess.check_call(git + ["update-ref", "refs/heads/tpl", "tpl~1"])
+        subprocess.check_call(git + ["merge", "-q", "--allow-unrelated-histories",
+                                     "-m", "Merge the template", "tpl"])
+
+        opts = __parse_arguments__(args=['--file-types', '*.c,*.txt,Makefile',
+                                         '--baseline', 'tpl', '--silent', student])
+        opts.progress = False
+        r = Runner(opts, None)
+        r.process()
+
+        # The rows of the root commit of the student are not taken for
+        # rows of the template
+        author = ('Frodo Baggins', 'frodo@shire.net')
+        self.assertEqual(r.changes.get_authorinfo_list()[author].insertions, 2)
+        self.assertEqual(list(r.blames.all_blames().keys()), [(author, 'student.txt')])
+        self.assertEqual(r.blames.all_blames()[(author, 'student.txt')].rows, 2)
+
     def test_output_text(self):
         # Set options
         opts = __parse_arguments__(args=['--grading', '--legacy',
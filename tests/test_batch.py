@@ -0,0 +1,76 @@
+# coding: utf-8
+#
+# This file is part of gitinspector.
+#
+# gitinspector is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# gitinspector is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gitinspector. If not, see <http://www.gnu.org/licenses/>.
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from gitinspector import batch
+from gitinspector.gitinspector import __parse_arguments__
+
+
+# Test the analysis of the repositories listed in a manifest
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        for name in ["basic", "trie"]:
+            zip_ref = zipfile.ZipFile("tests/resources/{0}-repository.zip".format(name), 'r')
+            zip_ref.extractall("build/tests")
+            zip_ref.close()
+        self.reports = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree("build/tests/basic-repository")
+        shutil.rmtree("build/tests/trie-repository")
+        shutil.rmtree(self.reports)
+
+    def test_manifest(self):
+        manifest = os.path.join(self.reports, "manifest")
+        with open(manifest, "w") as f:
+            f.write("# The runs of the test\n"
+                    "-F json -o {0}/basic.json build/tests/basic-repository\n"
+                    "\n"
+                    "--grading -o {0}/trie.txt build/tests/trie-repository\n"
+                    "-o {0}/missing.txt build/tests/missing-repository\n".format(self.reports))
+
+        summary = os.path.join(self.reports, "summary.json")
+        opts = __parse_arguments__(args=['--batch', manifest, '--jobs', '2',
+                                         '--branch', 'master', '-o', summary])
+        stream = io.StringIO()
+        self.assertEqual(batch.run(opts, stream), 1)
+
+        events = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(events[0], { "event": "start", "total": 3 })
+        self.assertEqual(sorted((e["line"], e["event"]) for e in events[1:-1]),
+                         [(2, "done"), (4, "done"), (5, "failed")])
+        self.assertEqual(events[-1], { "event": "end", "total": 3, "failed": 1,
+                                       "summary": summary })
+
+        with open(os.path.join(self.reports, "basic.json")) as f:
+            self.assertTrue("Andrew Johnson" in f.read())
+        self.assertTrue(os.path.getsize(os.path.join(self.reports, "trie.txt")) > 0)
+        self.assertFalse(os.path.exists(os.path.join(self.reports, "missing.txt")))
+
+        with open(summary) as f:
+            runs = json.load(f)["runs"]
+        self.assertEqual([r["status"] for r in runs], ["done", "done", "failed"])
+        self.assertEqual(sum(a["rows"] for a in runs[0]["authors"]), 51)
+        self.assertTrue("missing-repository" in runs[2]["error"])
@@ -0,0 +1,174 @@
+# coding: utf-8
+#
+# This file is part of gitinspector.
+#
+# gitinspector is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# gitinspector is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gitinspector. If not, see <http://www.gnu.org/licenses/>.
+
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+import zipfile
+
+from gitinspector import cache, git_utils
+from gitinspector.cache import BlameCache, CommitCache
+from gitinspector.gitinspector import Runner, __parse_arguments__
+
+
+# Test the persistent caches over the basic repository
+class CommitCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        zip_ref = zipfile.ZipFile("tests/resources/basic-repository.zip", 'r')
+        zip_ref.extractall("build/tests")
+        zip_ref.close()
+        self.repo = "build/tests/basic-repository"
+        self.cache_dir = tempfile.mkdtemp()
+        self.config = argparse.Namespace(ignore_space=False, hard=False, debug_mode=False,
+                                         baseline=None)
+
+    def tearDown(self):
+        shutil.rmtree("build/tests/basic-repository")
+        shutil.rmtree(self.cache_dir)
+
+    def __commit__(self, file_name, contents):
+        with open(os.path.join(self.repo, file_name), "w") as f:
+            f.write(contents)
+        subprocess.check_call(["git", "-C", self.repo, "add", file_name])
+        subprocess.check_call(["git", "-C", self.repo, "-c", "user.name=Frodo Baggins",
+                               "-c", "user.email=frodo@shire.net",
+                               "commit", "-q", "-m", "Add " + file_name])
+
+    def test_cached_commits(self):
+        expected = list(git_utils.commit_chunks(self.repo, "master", "", "", self.config))
+
+        chunks = list(CommitCache(self.cache_dir, self.repo, "master", "", "", self.config).chunks())
+        self.assertEqual(chunks, expected)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2) # The index and a batch
+
+        # The second time, the commits are read from the cache
+        chunks = list(CommitCache(self.cache_dir, self.repo, "master", "", "", self.config).chunks())
+        self.assertEqual(chunks, expected)
+
+    def test_batches(self):
+        expected = list(git_utils.commit_chunks(self.repo, "master", "", "", self.config))
+
+        # The commits are stored by batches, which are read one at a time
+        batch_size = cache.BATCH_SIZE
+        try:
+            cache.BATCH_SIZE = 3
+            chunks = list(CommitCache(self.cache_dir, self.repo, "master", "", "",
+                                      self.config).chunks())
+            self.assertEqual(chunks, expected)
+            self.assertEqual(len(os.listdir(self.cache_dir)), 3) # The index and 2 batches
+
+            subprocess.check_call(["git", "-C", self.repo, "checkout", "-q", "master"])
+            self.__commit__("ring.txt", "One ring to rule them all\n")
+            chunks = list(CommitCache(self.cache_dir, self.repo, "master", "", "",
+                                      self.config).chunks())
+            self.assertEqual(len(chunks), 5)
+            self.assertEqual(len(os.listdir(self.cache_dir)), 4)
+            self.assertEqual(list(CommitCache(self.cache_dir, self.repo, "master", "", "",
+                                              self.config).chunks()), chunks)
+        finally:
+            cache.BATCH_SIZE = batch_size
+
+        # A missing batch is read again from git
+        batches = [f for f in os.listdir(self.cache_dir) if f.count("-") == 2]
+        os.remove(os.path.join(self.cache_dir, batches[0]))
+        self.assertEqual(list(CommitCache(self.cache_dir, self.repo, "master", "", "",
+                                          self.config).chunks()), chunks)
+
+    def test_relative_dates(self):
+        # The same dates share the same cache, whatever their form
+        since = CommitCache(self.cache_dir, self.repo, "master", "--since='2018-07-01 12:00:00'",
+                            "", self.config)
+        self.assertEqual(since.path, CommitCache(self.cache_dir, self.repo, "master",
+                                                 "--since=2018-07-01T12:00:00", "",
+                                                 self.config).path)
+
+        # A relative date designates another interval as time goes by
+        paths = []
+        for _ in range(2):
+            paths.append(CommitCache(self.cache_dir, self.repo, "master", "",
+                                     "--until=1.second.ago", self.config).path)
+            paths.append(BlameCache(self.cache_dir, self.repo, "master", self.config,
+                                    "--since=1.second.ago").options)
+            time.sleep(1.1)
+        self.assertNotEqual(paths[0], paths[2])
+        self.assertNotEqual(paths[1], paths[3])
+
+    def test_new_commits(self):
+        list(CommitCache(self.cache_dir, self.repo, "master", "", "", self.config).chunks())
+
+        subprocess.check_call(["git", "-C", self.repo, "checkout", "-q", "master"])
+        self.__commit__("ring.txt", "One ring to rule them all\n")
+        chunks = list(CommitCache(self.cache_dir, self.repo, "master", "", "", self.config).chunks())
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(chunks[-1][1], (1, 0, b"ring.txt"))
+
+        # The history is rewritten, the cache is built again
+        subprocess.check_call(["git", "-C", self.repo, "reset", "-q", "--hard", "HEAD~2"])
+        self.__commit__("ring.txt", "One ring to find them\n")
+        chunks = list(CommitCache(self.cache_dir, self.repo, "master", "", "", self.config).chunks())
+        self.assertEqual(chunks, list(git_utils.commit_chunks(self.repo, "master", "", "", self.config)))
+        self.assertEqual(len(chunks), 4)
+
+
+# Test the blames cache over the trie repository
+class BlameCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        zip_ref = zipfile.ZipFile("tests/resources/trie-repository.zip", 'r')
+        zip_ref.extractall("build/tests")
+        zip_ref.close()
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree("build/tests/trie-repository")
+        shutil.rmtree(self.cache_dir)
+
+    def __blames__(self):
+        opts = __parse_arguments__(args=['--branch', 'master', '--silent',
+                                         '--cache-dir', self.cache_dir,
+                                         'build/tests/trie-repository'])
+        opts.progress = False
+        r = Runner(opts, None)
+        r.process()
+        return {k: (b.rows, b.comments, b.skew) for k, b in r.blames.all_blames().items()}
+
+    def test_cached_blames(self):
+        blames = self.__blames__()
+        cached_files = [f for f in os.listdir(self.cache_dir) if f.startswith("blames-")]
+        self.assertTrue(cached_files)
+
+        # The second time, the blames are read from the cache
+        self.assertEqual(self.__blames__(), blames)
+        self.assertEqual(len([f for f in os.listdir(self.cache_dir)
+                              if f.startswith("blames-")]), len(cached_files))
+
+    def test_unsafe_cache_dir(self):
+        # The cached data is unpickled, so a directory writable by the
+        # others is refused
+        os.chmod(self.cache_dir, 0o777)
+        with self.assertRaises(SystemExit):
+            self.__blames__()
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+        os.chmod(self.cache_dir, 0o755)
+        self.__blames__()
+        self.assertTrue(os.listdir(self.cache_dir))
@@ -100,3 +100,17 @@ class CommandLineOptionsTest(unittest.TestCase):
         sys.stdout.close()
         sys.stdout = stdout_orig
         shutil.rmtree("build/tests/basic-repository")
+
+    def test_jobs(self):
+        import contextlib
+        from io import StringIO
+        from gitinspector.gitinspector import __parse_arguments__
+
+        self.assertEqual(__parse_arguments__(args=['--jobs', '3']).jobs, 3)
+
+        # Any other value than a positive integer is reported as an error
+        for jobs in ['0', '-2', 'two']:
+            stderr = StringIO()
+            with contextlib.redirect_stderr(stderr), self.assertRaises(SystemExit):
+                __parse_arguments__(args=['--jobs', jobs])
+            self.assertTrue("error: " + jobs + ": the value must be" in stderr.getvalue())
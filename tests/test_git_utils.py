@@ -0,0 +1,149 @@
+# coding: utf-8
+#
+# This file is part of gitinspector.
+#
+# gitinspector is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# gitinspector is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gitinspector. If not, see <http://www.gnu.org/licenses/>.
+
+import argparse
+import shutil
+import subprocess
+import unittest
+import zipfile
+
+from gitinspector import git_utils
+from gitinspector.filtering import Filtering, Filters
+
+
+# Test the low-level git helpers over the basic repository
+class GitUtilsTest(unittest.TestCase):
+
+    def setUp(self):
+        zip_ref = zipfile.ZipFile("tests/resources/basic-repository.zip", 'r')
+        zip_ref.extractall("build/tests")
+        zip_ref.close()
+        self.repo = "build/tests/basic-repository"
+
+    def tearDown(self):
+        shutil.rmtree("build/tests/basic-repository")
+
+    def test_blob_reader(self):
+        with git_utils.BlobReader(self.repo) as reader:
+            readme = reader.read("master:README.txt")
+            self.assertEqual(len(readme.splitlines()), 1)   # README.txt is 1 line long
+            makefile = reader.read("master:Makefile")
+            self.assertEqual(len(makefile.splitlines()), 10) # Makefile   is 10 lines long
+            self.assertIsNone(reader.read("master:no-such-file"))
+            filec = reader.read("master:file.c")
+            self.assertEqual(len(filec.splitlines()), 40)    # file.c     is 40 lines long
+
+    def test_commit_chunks(self):
+        config = argparse.Namespace(ignore_space=False, hard=False, debug_mode=False,
+                                    baseline=None)
+        chunks = list(git_utils.commit_chunks(self.repo, "master", "", "", config))
+        self.assertEqual(len(chunks), 4) # 4 commits on master
+        for chunk in chunks:
+            (timestamp, date, sha, author, email) = chunk[0].decode("utf-8").split("|")
+            self.assertEqual(len(sha), 40)
+            self.assertEqual(len(chunk), 2) # Each commit modifies one file
+        self.assertEqual(chunks[0][1], (1, 0, b"README.txt"))
+        self.assertEqual(chunks[-1][1], (10, 0, b"Makefile"))
+
+    def test_tree_entries(self):
+        config = argparse.Namespace(debug_mode=False)
+        entries = git_utils.tree_entries(self.repo, "master", config)
+        self.assertEqual(sorted(entries), ["Makefile", "README.txt", "file.c"])
+        for (obj, size) in entries.values():
+            self.assertEqual(len(obj), 40)
+        self.assertEqual(entries["Makefile"][1], len(subprocess.check_output(
+            ["git", "-C", self.repo, "show", "master:Makefile"])))
+
+    def test_pathspecs(self):
+        filters = Filtering()
+        for f in ["file_in:*.c", "file_in:Makefile"]:
+            filters.__add_one_filter__(f, True)
+        filters.add_filters("file_out:build/")
+        self.assertEqual(filters.get_pathspecs(), ["**.c", "*Makefile",
+                                                   ":(exclude)*build/*"])
+
+        # Only the matching files are listed, with the same objects
+        config = argparse.Namespace(debug_mode=False)
+        entries = git_utils.tree_entries(self.repo, "master", config)
+        matching = git_utils.tree_entries(self.repo, "master", config, filters.get_pathspecs())
+        self.assertEqual(matching, {f: entries[f] for f in ["Makefile", "file.c"]})
+        times = git_utils.last_change_times(self.repo, "master", config, ["*.c"])
+        self.assertEqual(list(times), ["file.c"])
+
+        # A regular expression cannot be given to git, nor a glob that
+        # git does not read as python does
+        filters.add_filters("file_out:\\.o$")
+        self.assertNotIn(":(exclude)*\\.o$*", filters.get_pathspecs())
+        filters.__add_one_filter__("file_in:[!a]*.h", True)
+        self.assertEqual(filters.get_pathspecs(), [":(exclude)*build/*"])
+        filters.add_filters("file_in:^src/")
+        self.assertEqual(filters.get_pathspecs(), [":(exclude)*build/*"])
+
+    def test_commit_messages(self):
+        config = argparse.Namespace(ignore_space=False, hard=False, debug_mode=False,
+                                    baseline=None)
+        chunks = list(git_utils.commit_chunks(self.repo, "master", "", "", config, True))
+        self.assertEqual(len(chunks), 4)
+        (commit_line, sep, message) = chunks[-1][0].partition(b"\x1e")
+        self.assertEqual(git_utils.decode_message(message), "Add a Makefile for simplification")
+        self.assertEqual(chunks[-1][1], (10, 0, b"Makefile"))
+
+        # The revisions of the commits filtered by their messages are filtered
+        filters = Filtering()
+        filters.add_filters("message:Makefile")
+        sha = commit_line.decode("ascii").split("|")[2]
+        self.assertTrue(filters.is_filtered_message(sha, message))
+        self.assertFalse(filters.is_filtered_message(sha, b"Add README.txt file"))
+        self.assertTrue(filters.is_filtered(sha, Filters.REVISION))
+        self.assertEqual(filters.get_filtered(Filters.REVISION), {sha})
+
+    def test_last_change_times(self):
+        config = argparse.Namespace(debug_mode=False)
+        times = git_utils.last_change_times(self.repo, "master", config)
+        self.assertEqual(sorted(times), ["Makefile", "README.txt", "file.c"])
+        for f in times:
+            log = subprocess.check_output(["git", "-C", self.repo, "log", "-1",
+                                           "--format=%at", "master", "--", f])
+            self.assertEqual(times[f], int(log))
+
+    def test_config(self):
+        self.assertEqual(git_utils.config(self.repo, "inspector", False), {})
+        for (variable, value) in [("file-types", "*.c,*.h"), ("Metrics", "true"),
+                                  ("metrics", "false")]:
+            subprocess.check_call(["git", "-C", self.repo, "config", "--add",
+                                   "inspector." + variable, value])
+
+        # The last value of a variable is the one that applies
+        self.assertEqual(git_utils.config(self.repo, "inspector", False),
+                         {"file-types": "*.c,*.h", "metrics": "false"})
+
+    def test_file_name_filters(self):
+        filters = Filtering()
+        for f in ["file_in:*.c", "file_in:Makefile", "file_out:build/*"]:
+            filters.__add_one_filter__(f, True)
+        filters.add_filters("file_in:^src/.*\\.h$")
+        for _ in range(2): # The second verdicts are the memoized ones
+            self.assertTrue(filters.is_acceptable_file_name("src/file.c"))
+            self.assertTrue(filters.is_acceptable_file_name("src/file.h"))
+            self.assertFalse(filters.is_acceptable_file_name("include/file.h"))
+            self.assertFalse(filters.is_acceptable_file_name("build/lib/file.c"))
+        self.assertEqual(filters.get_filtered(Filters.FILE_OUT), {"build"})
+
+        # The verdicts are forgotten when the filters change
+        filters.__add_one_filter__("file_out:*.c", True)
+        self.assertFalse(filters.is_acceptable_file_name("src/file.c"))
+        self.assertTrue(filters.is_acceptable_file_name("Makefile"))
@@ -15,13 +15,19 @@
 # You should have received a copy of the GNU General Public License
 # along with gitinspector. If not, see <http://www.gnu.org/licenses/>.
 
+import array
+import concurrent.futures
 import shutil
 import unittest
 import zipfile
 
 
 from gitinspector.gitinspector import Runner, __parse_arguments__
+from gitinspector import columns
 from gitinspector.changes import CommitType
+from gitinspector.filtering import Filters
+
+from . import set_timezone
 
 
 # Test the metrics on the basic repository, a very simple repository
@@ -138,6 +144,10 @@ class MetricsTrieTest(unittest.TestCase):
         self.assertEqual(len(authorinfos), 5) # 5 authors
 
     def test_small_changes(self):
+        # The days of the bounds depend on the timezone, and so do the
+        # commits inside them
+        self.addCleanup(set_timezone, set_timezone("UTC"))
+
         opts = __parse_arguments__(args=['--silent', '--since=2015-10-20', '--until=2015-10-22',
                                          'build/tests/trie-repository'])
         opts.progress = False
@@ -220,3 +230,140 @@ class MetricsTrieTest(unittest.TestCase):
         self.assertEqual(t_blames_2[1], 56)
         t_blames_3 = [ t for t in t_blames if t[0][0] == "Bilbo Baggins" ][0]
         self.assertEqual(t_blames_3[1], 109)
+
+    def test_all_blames_with_processes(self):
+        opts = __parse_arguments__(args=['--silent',
+                                         '--blame-backend', 'processes',
+                                         'build/tests/trie-repository'])
+        opts.progress = False
+
+        # Launch runner
+        r = Runner(opts, None)
+        r.process()
+
+        # Count the blames in src/trie.c
+        t_blames = r.blames.blames_for_file("src/trie.c")
+        self.assertEqual(len(t_blames), 5)    # 5 authors
+        t_blames_1 = [ t for t in t_blames if t[0][0] == "Frodo Baggins" ][0]
+        self.assertEqual(t_blames_1[1], 40)
+        t_blames_2 = [ t for t in t_blames if t[0][0] == "Peregrin Took" ][0]
+        self.assertEqual(t_blames_2[1], 64)
+        t_blames_3 = [ t for t in t_blames if t[0][0] == "Bilbo Baggins" ][0]
+        self.assertEqual(t_blames_3[1], 107)
+
+
+# Test the metrics when analyzing several repositories at once
+class MetricsMultipleRepositoriesTest(unittest.TestCase):
+
+    def setUp(self):
+        for repository in ["basic", "trie"]:
+            zip_ref = zipfile.ZipFile("tests/resources/%s-repository.zip" % repository, 'r')
+            zip_ref.extractall("build/tests")
+            zip_ref.close()
+
+    def tearDown(self):
+        shutil.rmtree("build/tests/basic-repository")
+        shutil.rmtree("build/tests/trie-repository")
+
+    def test_merged_changes(self):
+        opts = __parse_arguments__(args=['--silent',
+                                         '--branch', 'master',
+                                         'build/tests/basic-repository',
+                                         'build/tests/trie-repository'])
+        opts.progress = False
+
+        # Launch runner
+        r = Runner(opts, None)
+        r.process()
+
+        # Test number of commits
+        self.assertEqual(len(r.changes.all_commits()), 35)  # 4 commits + 31 commits
+        timestamps = [int(c.timestamp) for c in r.changes.all_commits()]
+        self.assertEqual(timestamps, sorted(timestamps))
+        l_commits = [c for c in r.changes.all_commits() if c.author == "Abraham Lincoln"]
+        self.assertEqual(len(l_commits), 1)  # 1 commit
+        b_commits = [c for c in r.changes.all_commits() if c.author == "Bilbo Baggins"]
+        self.assertEqual(len(b_commits), 12) # 11 commits + 1 merge
+
+        # Test the authors of both repositories
+        authorinfos = r.changes.get_authorinfo_list()
+        self.assertEqual(len(authorinfos), 7) # 2 authors + 5 authors
+        self.assertTrue("README.txt" in r.changes.files)
+        self.assertTrue("src/trie.c" in r.changes.files)
+
+    def test_parallel_repositories(self):
+        results = []
+        for jobs in ['1', '2']:
+            opts = __parse_arguments__(args=['--silent', '--jobs', jobs,
+                                             '--branch', 'master',
+                                             '--exclude', 'file_out:Makefile',
+                                             'build/tests/basic-repository',
+                                             'build/tests/trie-repository'])
+            opts.progress = False
+
+            # Launch runner, the repositories being analyzed by 2 processes
+            r = Runner(opts, None)
+            r.process()
+            results.append(([c.sha for c in r.changes.all_commits()],
+                            {k: b.rows for k, b in r.blames.all_blames().items()},
+                            sorted(r.context.filters.get_filtered(Filters.FILE_OUT)),
+                            {k: a.commits for k, a in r.changes.get_authorinfo_list().items()}))
+
+        self.assertEqual(len(results[1][0]), 35)  # 4 commits + 31 commits
+        self.assertEqual(results[0], results[1])
+
+    def test_concurrent_runners(self):
+        def run(excluded):
+            opts = __parse_arguments__(args=['--silent', '--branch', 'master',
+                                             '--exclude', excluded,
+                                             'build/tests/basic-repository'])
+            opts.progress = False
+            r = Runner(opts, None)
+            r.process()
+            return r
+
+        # Two runs with different filters in the same process do not
+        # share their state
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            (r1, r2) = executor.map(run, ['file_out:Makefile', 'author:Abraham Lincoln'])
+
+        self.assertEqual(r1.context.filters.get_filtered(Filters.FILE_OUT), {"Makefile"})
+        self.assertFalse(r2.context.filters.get_filtered(Filters.FILE_OUT))
+        self.assertTrue(any(k[0][0] == "Abraham Lincoln" for k in r1.blames.all_blames()))
+        self.assertFalse(any(k[0][0] == "Abraham Lincoln" for k in r2.blames.all_blames()))
+        self.assertTrue(any(k[1] == "Makefile" for k in r2.blames.all_blames()))
+        self.assertFalse(any(k[1] == "Makefile" for k in r1.blames.all_blames()))
+
+    def test_aliases(self):
+        opts = __parse_arguments__(args=['--silent', '--branch', 'master', '--aliases',
+                                         "{'jojo@gov.us': 'Abraham Lincoln <abe@gov.us>'}",
+                                         'build/tests/basic-repository'])
+        opts.progress = False
+        r = Runner(opts, None)
+        r.process()
+
+        # The commits and the rows of both authors are accounted to one
+        authorinfos = r.changes.get_authorinfo_list()
+        self.assertEqual(list(authorinfos), [("Abraham Lincoln", "abe@gov.us")])
+        self.assertEqual(authorinfos[("Abraham Lincoln", "abe@gov.us")].commits, 4)
+        self.assertEqual(list(r.blames.get_summed_blames()), [("Abraham Lincoln", "abe@gov.us")])
+        self.assertEqual(r.context.identities.get_id(("Andrew Johnson", "jojo@gov.us")), None)
+
+    def test_group_sums(self):
+        keys = array.array("q", [3, 1, 3, 2, 1])
+        values = array.array("q", [10, 20, 30, 40, 50])
+        expected = {3: (2, 40), 1: (2, 70), 2: (1, 40)}
+
+        # The columns give the same results with or without NumPy, and
+        # the keys appear in the order of their first rows
+        numpy = columns.numpy
+        for module in (None, numpy):
+            columns.numpy = module
+            try:
+                self.assertEqual(list(columns.group_sums(keys, values).items()),
+                                 list(expected.items()))
+                self.assertEqual(columns.group_sums(array.array("q"), array.array("q")), {})
+                self.assertEqual(list(columns.combine(keys, values, 100)), [310, 120, 330, 240, 150])
+                self.assertEqual(list(columns.take(values, array.array("q", [4, 0]))), [50, 10])
+            finally:
+                columns.numpy = numpy
@@ -17,6 +17,7 @@
 
 import os
 import shutil
+import subprocess
 import tempfile
 import unittest
 import zipfile
@@ -24,6 +25,8 @@ import zipfile
 import gitinspector.localization as localization
 from gitinspector.gitinspector import Runner, FileWriter, __parse_arguments__
 
+from . import set_timezone
+
 
 class TrieRepositoryTest(unittest.TestCase):
 
@@ -47,6 +50,90 @@ class TrieRepositoryTest(unittest.TestCase):
         r = Runner(opts, None)
         r.process()
 
+        # The FileDiffs of a file share its name
+        diffs = r.changes.diffs_for_file("src/trie.c")
+        self.assertTrue(len(diffs) > 1)
+        self.assertTrue(all(d.name is diffs[0].name for d in diffs))
+        commits = r.changes.all_commits()
+        self.assertTrue(all(a.timestamp <= b.timestamp for (a, b) in zip(commits, commits[1:])))
+
+        # The statistics per date sum up to the statistics of the authors
+        authorinfos = r.changes.get_authorinfo_list()
+        for (author, info) in authorinfos.items():
+            dateinfos = [i for ((d, a), i) in r.changes.get_authordateinfo_list().items()
+                         if a == author]
+            self.assertEqual(sum(i.commits for i in dateinfos), info.commits)
+            self.assertEqual(sum(i.insertions for i in dateinfos), info.insertions)
+        self.assertEqual(sorted(r.changes.authors_by_responsibilities()), sorted(authorinfos))
+
+    def test_blame_order(self):
+        opts = __parse_arguments__(args=['--jobs', '1', '--silent',
+                                         'build/tests/trie-repository'])
+        opts.progress = False
+        r = Runner(opts, None)
+        r.process()
+
+        # With a single worker, the files are blamed in the order of
+        # submission, namely the biggest ones first
+        sizes = {}
+        tree = subprocess.check_output(["git", "-C", "build/tests/trie-repository", "ls-tree",
+                                        "-r", "-l", r.changes.last_commit().sha])
+        for line in tree.decode("utf-8").splitlines():
+            (info, name) = line.split("\t", 1)
+            sizes[name] = int(info.split()[3])
+        files = list(dict.fromkeys(f for (a, f) in r.blames.all_blames()))
+        self.assertTrue(len(files) > 1)
+        self.assertEqual(files, sorted(files, key=lambda f: sizes[f], reverse=True))
+
+    def test_pathspecs(self):
+        args = ['--file-types', '*.c', '--exclude', 'file_out:test/', '--silent',
+                'build/tests/trie-repository']
+        opts = __parse_arguments__(args=args)
+        opts.progress = False
+        r = Runner(opts, None)
+        r.process()
+
+        # git leaves out the other files, which changes neither the
+        # blames nor the diffs of the matching files
+        opts = __parse_arguments__(args=['--pathspecs'] + args)
+        opts.progress = False
+        s = Runner(opts, None)
+        s.process()
+        self.assertEqual({k: b.rows for k, b in s.blames.all_blames().items()},
+                         {k: b.rows for k, b in r.blames.all_blames().items()})
+        self.assertEqual(sorted(s.changes.files), ["src/trie.c"])
+        self.assertEqual([(d.insertions, d.deletions) for d in s.changes.diffs_for_file("src/trie.c")],
+                         [(d.insertions, d.deletions) for d in r.changes.diffs_for_file("src/trie.c")])
+
+    def test_since(self):
+        # The days of the bounds depend on the timezone, and so do the
+        # commits inside them
+        self.addCleanup(set_timezone, set_timezone("UTC"))
+
+        opts = __parse_arguments__(args=['--since', '2015-10-20', '--until', '2015-10-22',
+                                         '--silent',
+                                         'build/tests/trie-repository'])
+        opts.progress = False
+
+        r = Runner(opts, None)
+        r.process()
+
+        # Only the rows written inside the interval are blamed
+        blames = r.blames.all_blames()
+        self.assertEqual(sorted(blames.keys()),
+                         [(('Bilbo Baggins', 'bilbo.baggins@shire.net'), 'src/trie.c'),
+                          (('Samwise Gamgee', 'samwise.gamgee@shire.net'), 'test/Makefile'),
+                          (('Samwise Gamgee', 'samwise.gamgee@shire.net'), 'test/trie_test.c')])
+        self.assertEqual(blames[(('Bilbo Baggins', 'bilbo.baggins@shire.net'), 'src/trie.c')].rows, 14)
+
+        # The files that were not modified inside the interval have no
+        # row to be blamed
+        opts.blame_all_files = True
+        r = Runner(opts, None)
+        r.process()
+        self.assertEqual({k: b.rows for k, b in r.blames.all_blames().items()},
+                         {k: b.rows for k, b in blames.items()})
+
     def test_output_text(self):
         # Set options
         opts = __parse_arguments__(args=['--grading', '--legacy',
@@ -87,6 +174,13 @@ class TrieRepositoryTest(unittest.TestCase):
             self.assertTrue("The following history timeline" in contents)
         os.remove(file.name)
 
+        # The statistics are shared by the outputs, which do not modify them
+        authorinfos = r.changes.get_authorinfo_list()
+        self.assertIs(authorinfos, r.changes.get_authorinfo_list())
+        self.assertTrue(all(isinstance(a.types, dict) for a in authorinfos.values()))
+        with self.assertRaises(TypeError):
+            authorinfos[("John Doe", "john@doe.org")] = None
+
     def test_output_xml(self):
         # Set options
         opts = __parse_arguments__(args=['--grading', '--legacy',